@@ -0,0 +1,165 @@
+'''
+    The RegionIndex class stores the tumor region detected in each image
+    of the dataset, so the region is only detected once.
+
+    Regions are keyed by a hash of the image pixels. Each index holds
+    the regions found with one set of detector parameters, and is saved
+    to disk as a .npy table with one row per image, holding the circle
+    detected and its box clipped to the image. Changing the parameters
+    of the detector uses a new index.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import os
+import hashlib
+import threading
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, where saves are not locked between
+    # processes
+    fcntl = None
+
+REGIONS_PATH = '../cache/regions'
+
+REGION_DTYPE = np.dtype([
+            ('key', 'u1', (20,)),
+            ('found', '?'),
+            ('x', '<i4'), ('y', '<i4'), ('r', '<i4'),
+            ('x_start', '<i4'), ('y_start', '<i4'),
+            ('x_end', '<i4'), ('y_end', '<i4'),
+        ])
+
+class RegionIndex:
+    # indexes already loaded, keyed by detector parameters and path
+    indexes = {}
+
+    @staticmethod
+    def get_index(params, regions_path=REGIONS_PATH):
+        '''Return the RegionIndex for the detector parameters, loading
+        it the first time it is requested.
+
+        Parameters:
+        params: A string describing the parameters of the detector.
+        regions_path: The directory where the indexes are saved. Default
+                      is REGIONS_PATH.
+        '''
+        key = (params, regions_path)
+        if key not in RegionIndex.indexes:
+            RegionIndex.indexes[key] = RegionIndex(params, regions_path)
+        return RegionIndex.indexes[key]
+
+    def __init__(self, params, regions_path=REGIONS_PATH):
+        '''Construct a RegionIndex object, loading the regions saved for
+        the detector parameters.
+
+        Use get_index to share the index between detectors.
+
+        Parameters:
+        params: A string describing the parameters of the detector.
+        regions_path: The directory where the indexes are saved. Default
+                      is REGIONS_PATH.
+        '''
+        params_hash = hashlib.sha1(params.encode()).hexdigest()
+        self.path = os.path.join(regions_path, f'{params_hash}.npy')
+        self.regions = {}
+        self.unsaved = 0
+        self.lock = threading.Lock()
+        self.__load()
+
+    def has_region(self, key):
+        '''Return True if the index holds the region of the image.
+
+        Parameters:
+        key: The hex digest of the image hash.
+        '''
+        return key in self.regions
+
+    def get_region(self, key):
+        '''Return a tuple of the circle (x, y, r) detected in the image
+        and its box (x_start, y_start, x_end, y_end) clipped to the
+        image. Both are None if no tumor was detected.
+
+        Parameters:
+        key: The hex digest of the image hash.
+
+        Raises:
+        KeyError: When the index does not hold the region of the image.
+        '''
+        return self.regions[key]
+
+    def add_region(self, key, circle, box):
+        '''Add the region of an image to the index. The region is kept
+        in memory until the index is saved.
+
+        Parameters:
+        key: The hex digest of the image hash.
+        circle: A tuple of the x, y and radius of the circle detected,
+                or None if no tumor was detected.
+        box: A tuple of the x_start, y_start, x_end and y_end of the box
+             around the circle, or None if no tumor was detected.
+        '''
+        with self.lock:
+            if key not in self.regions:
+                self.unsaved += 1
+            self.regions[key] = (circle, box)
+
+    def save(self):
+        '''Save the regions of the index to disk, when regions have been
+        added since it was loaded or saved. Regions saved by other
+        processes in the meantime are kept.
+
+        The saved index is reloaded, merged and replaced while holding a
+        lock on a file beside the index, so processes saving at the same
+        time do not drop each other's regions.'''
+        with self.lock:
+            if not self.unsaved:
+                return
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # the file lock is released when the lock file is closed
+            with open(f'{self.path}.lock', 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self.__save_merged()
+
+    def __save_merged(self):
+        '''Merge the regions saved to disk into the index, and save it.
+        The thread and file locks must be held by the caller.'''
+        self.__load()
+        table = np.zeros(len(self.regions), dtype=REGION_DTYPE)
+        for row, (key, (circle, box)) in zip(table,
+                sorted(self.regions.items())):
+            row['key'] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+            if circle is not None:
+                row['found'] = True
+                row['x'], row['y'], row['r'] = circle
+                (row['x_start'], row['y_start'],
+                 row['x_end'], row['y_end']) = box
+
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as file:
+            np.save(file, table)
+        os.replace(temp_path, self.path)
+        self.unsaved = 0
+
+    def __len__(self):
+        '''Return the number of images in the index.'''
+        return len(self.regions)
+
+    def __load(self):
+        '''Load the regions saved to disk that are not held in memory,
+        if the index exists.'''
+        if not os.path.exists(self.path):
+            return
+
+        for row in np.load(self.path):
+            circle = box = None
+            if row['found']:
+                circle = (int(row['x']), int(row['y']), int(row['r']))
+                box = (int(row['x_start']), int(row['y_start']),
+                       int(row['x_end']), int(row['y_end']))
+            self.regions.setdefault(row['key'].tobytes().hex(), (circle, box))
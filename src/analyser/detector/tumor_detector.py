@@ -1,30 +1,117 @@
 '''
     The TumorDetector class identifies brain tumors in a MRI scan. 
+
+    Detection runs once per image. The optimal tumor found is kept in a
+    RegionIndex, keyed by a hash of the image, so detectors built for 
+    the same image by each XAI tool and analyser share one detection. 
+    When the index of the dataset has been saved with index_images, 
+    later runs read every region from disk without detecting it again.
 '''
 __author__ = 'Dean Whitbread'
 __version__ = '21-07-2023'
 
+import hashlib
 import cv2
 import numpy as np
 from analyser.detector.drawer.image_drawer import ImageDrawer
 from analyser.detector.pixel_range import PixelRange
+from analyser.detector.region_index import RegionIndex
 
 RGB_THRESHOLD = (130,130,130)
+BLUR_KERNEL_SIZE = (9, 9)
+BLUR_SIGMA = 2
+HOUGH_PARAMS = {
+            'dp': 1.5,
+            'minDist': 20,
+            'param1': 100,
+            'param2': 30,
+            'minRadius': 35,
+            'maxRadius': 60,
+        }
+
+# change this string whenever the detection changes, so regions found
+# by an older detector are not reused
+DETECTOR_PARAMS = (f'hough-{sorted(HOUGH_PARAMS.items())}-'
+                   f'blur-{BLUR_KERNEL_SIZE}-{BLUR_SIGMA}-'
+                   f'threshold-{RGB_THRESHOLD}-centre-pixel')
+
+# the detection mode recorded with each run. Regions are only detected
+# by a Hough transform of the whole image
+DETECTION_MODE = 'full'
 
 class TumorDetector:
-    def __init__(self, image):
+    @staticmethod
+    def index_images(images, region_index=None):
+        '''Detect the tumor region of each image missing from the index,
+        and save the index. Return the number of images detected.
+
+        Parameters:
+        images: An iterable of the MRI images.
+        region_index: The RegionIndex the regions are added to. Default
+                      is None, which uses the index of DETECTOR_PARAMS.
+        '''
+        if region_index is None:
+            region_index = RegionIndex.get_index(DETECTOR_PARAMS)
+        detected = 0
+        for image in images:
+            key = TumorDetector.get_image_key(image)
+            if not region_index.has_region(key):
+                TumorDetector(image, region_index)
+                detected += 1
+
+        region_index.save()
+        return detected
+
+    @staticmethod
+    def get_image_key(image):
+        '''Return a hash identifying the pixels of an image.
+
+        Parameters:
+        image: The MRI image.
+        '''
+        image = np.ascontiguousarray(image)
+        image_hash = hashlib.sha1(f'{image.shape}{image.dtype}'.encode())
+        image_hash.update(image)
+        return image_hash.hexdigest()
+
+    def __init__(self, image, region_index=None):
         '''Construct the TumorDetection object.
         
         Parameters:
         image: The MRI image to detect tumors from. 
+        region_index: The RegionIndex holding the regions detected. 
+                      Default is None, which uses the index of 
+                      DETECTOR_PARAMS.
         '''
         self.image = image
+        self.key = TumorDetector.get_image_key(image)
+        if region_index is None:
+            region_index = RegionIndex.get_index(DETECTOR_PARAMS)
+        self.region_index = region_index
         self.optimal_coord = self.find_optimal_tumor_coord()
 
     def find_optimal_tumor_coord(self):
         '''Return a list containing the coordinates and radii of the 
         optimal tumor detected.
 
+        If no tumors are detected, None is returned. The tumor is only
+        detected when the image is missing from the region index.
+        '''
+        if not self.region_index.has_region(self.key):
+            optimal_coord = self.__detect_optimal_tumor()
+            circle = box = None
+            if optimal_coord is not None:
+                circle = tuple(int(value) for value in optimal_coord[0])
+                box = self.__get_clipped_box(*circle)
+            self.region_index.add_region(self.key, circle, box)
+
+        circle, _ = self.region_index.get_region(self.key)
+        return None if circle is None else [circle]
+
+    def __detect_optimal_tumor(self):
+        '''Return a list containing the coordinates and radii of the 
+        optimal tumor detected in the image.
+
         If no tumors are detected, None is returned. 
         '''
         tumor_areas = self.__detect_tumor_areas()
@@ -52,7 +139,7 @@ class TumorDetector:
     
     def image_has_tumor(self):
         '''Return if the image contains a tumor.'''
-        return self.find_optimal_tumor_coord() != None
+        return self.optimal_coord is not None
 
     def get_tumor_area_ranges(self):
         '''Return a list of PixelRanges objects that represent a range
@@ -61,10 +148,28 @@ class TumorDetector:
         PixelRanges objects are in the order: 
             [x_pixel_range_object, y_pixel_range_object]
         '''
-        (x, y, r) = self.find_optimal_tumor_coord()[0]
+        _, (x_start, y_start, x_end, y_end) = self.region_index.get_region(
+                    self.key
+                )
+
+        x_pixel_range = PixelRange(start=x_start, end=x_end)
+        y_pixel_range = PixelRange(start=y_start, end=y_end) 
+        
+        xy_ranges = [x_pixel_range, y_pixel_range]
+
+        return xy_ranges
+
+    def __get_clipped_box(self, x, y, r):
+        '''Return a tuple of the x_start, y_start, x_end and y_end of the
+        box around a circle, clipped to the image.
+
+        Parameters:
+        x: The x-coordinate of the centre of the circle.
+        y: The y-coordinate of the centre of the circle.
+        r: The radius of the circle.
+        '''
         y_start, y_end = y-r, y+r
         x_start, x_end = x-r, x+r
-        
 
         points = [y_start, y_end, x_start, x_end]
         max_size = self.image.shape[0]
@@ -75,18 +180,14 @@ class TumorDetector:
             elif points[i] < 0:
                 points[i] = 0
 
-        x_pixel_range = PixelRange(start=points[2], end=points[3])
-        y_pixel_range = PixelRange(start=points[0], end=points[1]) 
-        
-        xy_ranges = [x_pixel_range, y_pixel_range]
-
-        return xy_ranges
-
+        return (points[2], points[0], points[3], points[1])
 
     def __get_blurred_image(self):
         '''Return a blurred version of the image.'''
         grayscale_image = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
-        blurred_image = cv2.GaussianBlur(grayscale_image, (9, 9), 2)
+        blurred_image = cv2.GaussianBlur(
+                    grayscale_image, BLUR_KERNEL_SIZE, BLUR_SIGMA
+                )
         return blurred_image
 
     def __detect_tumor_areas(self):
@@ -100,12 +201,7 @@ class TumorDetector:
         circles = cv2.HoughCircles(
             blurred_image,
             cv2.HOUGH_GRADIENT,
-            dp=1.5,
-            minDist=20,
-            param1=100,
-            param2=30,
-            minRadius=35,
-            maxRadius=60,
+            **HOUGH_PARAMS,
         )
         
         if circles is not None:
@@ -132,52 +228,55 @@ class TumorDetector:
         '''Reduce the areas detected as tumors by using the colour
         threshold.
 
-        If no areas are above the colour threashold, an empty list is 
-        returned.
+        The colour of the centre pixel of each area is compared with the
+        threshold as a (R, G, B) tuple. If no areas are above the colour
+        threashold, an empty list is returned.
 
         Parameters:
         areas: A list of circle coordinates and radii.
         '''
-        optimised_areas = []
+        areas = np.asarray(areas)
+        if len(areas) == 0:
+            return []
 
-        for (x, y, r) in areas:
-            pixel_weight = self.__check_pixel_colour(x,y)
-            if pixel_weight >= RGB_THRESHOLD:
-                region = (x, y, r)
-                optimised_areas.append(region)
+        red, green, blue = self.__get_centre_colours(areas)
+        t_red, t_green, t_blue = RGB_THRESHOLD
+        above_threshold = (red > t_red) | (red == t_red) & (
+                    (green > t_green) | (green == t_green) & (blue >= t_blue)
+                )
 
-        return optimised_areas
+        return [tuple(area) for area in areas[above_threshold]]
 
     def __reduce_using_pixel_weight(self, areas):
         '''Reduce the areas detected as tumors by selecting the areas
         with the whitest pixel color. 
 
+        Colours are compared as (R, G, B) tuples, and the first of the
+        areas with the whitest centre pixel is selected.
+
         Parameters:
         areas: A list of circle coordinates and radii.
         '''
+        areas = np.asarray(areas)
         if len(areas) == 0:
             return []
 
-        optimal_areas = [] 
-        optimal = areas[0]
-        for (x, y, r) in areas:
-            (x2, y2, r2) = optimal
-            optimal_pixel_weight = self.__check_pixel_colour(x2,y2)
-            other_pixel_weight = self.__check_pixel_colour(x,y)
-
-            if other_pixel_weight > optimal_pixel_weight:
-                optimal = (x, y, r)
+        red, green, blue = self.__get_centre_colours(areas)
 
-        optimal_areas.append(optimal)
+        # the last area in (R, G, B) order has the whitest centre pixel
+        whitest = np.lexsort((blue, green, red))[-1]
+        is_whitest = ((red == red[whitest]) & (green == green[whitest]) 
+                      & (blue == blue[whitest]))
+        optimal = areas[np.flatnonzero(is_whitest)[0]]
 
-        return optimal_areas
+        return [tuple(optimal)]
 
-    def __check_pixel_colour(self, x, y):
-        '''Return the pixel colour in the format: (R, G, B). 
+    def __get_centre_colours(self, areas):
+        '''Return a tuple of arrays of the red, green and blue values of
+        the centre pixel of each area.
 
         Parameters:
-        x: The x-coordinate in the image.
-        y: The y-coordinate in the image.
+        areas: An array of circle coordinates and radii.
         '''
-        b, g, r = self.image[y, x]
-        return (r, g, b)
+        colours = self.image[areas[:, 1], areas[:, 0]]
+        return (colours[:, 2], colours[:, 1], colours[:, 0])
@@ -5,55 +5,132 @@
 __author__ = 'Dean Whitbread'
 __version__ = '16-07-2023'
 
+import cv2
+import numpy as np
 from analyser.detector.tumor_detector import TumorDetector
 from analyser.pixel_analyser import PixelAnalyser as pixel
+from analyser.region_statistics import RegionStatistics
+from analyser.mask_store import MaskStore
+
+# the tumor is either the box around the region found by the 
+# TumorDetector, or the mask of the BraTS segmentation
+REGION_GROUND_TRUTH = 'region'
+MASK_GROUND_TRUTH = 'mask'
+GROUND_TRUTHS = (REGION_GROUND_TRUTH, MASK_GROUND_TRUTH)
 
 class ImageAnalyser:
-    def __init__(self, xai_tool):
+    def __init__(self, xai_tool, ground_truth=REGION_GROUND_TRUTH,
+            mask_store=None):
         '''Construct an ImageAnalyser object.
 
         Parameters:
         xai_tool: The XaiTool object used to explain the image. 
+        ground_truth: Either 'region', which scores against the region 
+                      found by the TumorDetector, or 'mask', which scores
+                      against the segmentation mask of the image. 
+                      Default is REGION_GROUND_TRUTH.
+        mask_store: The MaskStore holding the segmentation masks. 
+                    Default is None, which uses the store at MASKS_PATH.
+
+        Raises:
+        ValueError: When the ground truth is not one of GROUND_TRUTHS.
+        KeyError: When the ground truth is 'mask' and the store does not
+                  hold the mask of the image.
         '''
+        if ground_truth not in GROUND_TRUTHS:
+            raise ValueError(f'Unknown ground truth: {ground_truth}.')
+
         self.image = xai_tool.get_target_image()
         self.xai_image = xai_tool.get_explained_image()
         self.xai_method = self.__get_xai_method_name(xai_tool)
-        self.td = TumorDetector(self.image)
+        self.ground_truth = ground_truth
+        self.td = None
+        self.tumor_mask = None
+        if ground_truth == MASK_GROUND_TRUTH:
+            if mask_store is None:
+                mask_store = MaskStore.get_store()
+            self.tumor_mask = mask_store.get_mask(
+                        TumorDetector.get_image_key(self.image)
+                    )
+        else:
+            self.td = TumorDetector(self.image)
         self.score_map = self.__analyse_image()
 
     def precision_score(self):
         '''Return the precision score of the explained image.'''
-        tp = self.score_map['tp']
-        fp = self.score_map['fp']
+        return ImageAnalyser.precision(self.score_map)
+
+    def recall_score(self):
+        '''Return the recall score of the explained image.'''
+        return ImageAnalyser.recall(self.score_map)
+    
+    def accuracy_score(self):
+        '''Return the accuracy score of the explained_image.'''
+        return ImageAnalyser.accuracy(self.score_map)
+
+    def f1_score(self):
+        '''Return the F1 score of the explained image.'''
+        return ImageAnalyser.f1(self.score_map)
+
+    def get_score_map(self):
+        '''Return a copy of the map of the true positives (tp), true 
+        negatives (tn), false positives (fp) and false negatives (fn) of
+        the explained image.'''
+        return dict(self.score_map)
+
+    @staticmethod
+    def precision(score_map):
+        '''Return the precision score of a score map.
+
+        Parameters:
+        score_map: A map of the tp, tn, fp and fn of an explained image.
+        '''
+        tp = score_map['tp']
+        fp = score_map['fp']
         
         try:
             return tp / (tp + fp)
         except ZeroDivisionError:
             return 0
 
-    def recall_score(self):
-        '''Return the recall score of the explained image.'''
-        tp = self.score_map['tp']
-        fn = self.score_map['fn']
+    @staticmethod
+    def recall(score_map):
+        '''Return the recall score of a score map.
+
+        Parameters:
+        score_map: A map of the tp, tn, fp and fn of an explained image.
+        '''
+        tp = score_map['tp']
+        fn = score_map['fn']
         
         try:
             return tp / (tp + fn)
         except ZeroDivisionError:
             return 0
-    
-    def accuracy_score(self):
-        '''Return the accuracy score of the explained_image.'''
-        tp = self.score_map['tp']
-        tn = self.score_map['tn']
-        fp = self.score_map['fp']
-        fn = self.score_map['fn']
+
+    @staticmethod
+    def accuracy(score_map):
+        '''Return the accuracy score of a score map.
+
+        Parameters:
+        score_map: A map of the tp, tn, fp and fn of an explained image.
+        '''
+        tp = score_map['tp']
+        tn = score_map['tn']
+        fp = score_map['fp']
+        fn = score_map['fn']
 
         return (tp+tn) / (tp+tn+fp+fn)
 
-    def f1_score(self):
-        '''Return the F1 score of the explained image.'''
-        p_score = self.precision_score()
-        r_score = self.recall_score()
+    @staticmethod
+    def f1(score_map):
+        '''Return the F1 score of a score map.
+
+        Parameters:
+        score_map: A map of the tp, tn, fp and fn of an explained image.
+        '''
+        p_score = ImageAnalyser.precision(score_map)
+        r_score = ImageAnalyser.recall(score_map)
          
         return (2*p_score*r_score) / (p_score+r_score) if p_score and r_score else float(0)
 
@@ -69,6 +146,30 @@ class ImageAnalyser:
 
         return output
 
+    def get_region_statistics(self):
+        '''Return the RegionStatistics object of the explained image.'''
+        return self.region_stats
+
+    def get_region_score_map(self, x_start, y_start, x_end, y_end):
+        '''Return a map of scores for true positives (tp), true 
+        negatives (tn), false positives (fp), and false negatives (fn), 
+        treating the region as the location of the tumor.
+
+        Any number of regions can be scored for the same explained 
+        image, since each region costs a constant number of lookups.
+
+        Parameters:
+        x_start: The first x-coordinate of the region.
+        y_start: The first y-coordinate of the region.
+        x_end: The x-coordinate after the last column of the region.
+        y_end: The y-coordinate after the last row of the region.
+        '''
+        pn_map = self.__create_positive_negative_map()
+        tumor_pn_map = self.__create_positive_negative_map(
+                    x_start, y_start, x_end, y_end
+                )
+        return self.__create_score_map(pn_map, tumor_pn_map)
+
     def __analyse_image(self):
         '''Analyse the image and return a map of scores for true 
         positives (tp), true negatives (tn), false positives (fp),
@@ -76,10 +177,17 @@ class ImageAnalyser:
 
         The key for each scores is the acronym inside the bracket.
         '''
-        score_map = {}
+        positive_mask, negative_mask = pixel.get_positive_negative_masks(
+                    self.xai_image, self.xai_method
+                )
+        self.region_stats = RegionStatistics(positive_mask, negative_mask)
         pn_map = self.__create_positive_negative_map()
         
-        if self.td.image_has_tumor():
+        if self.ground_truth == MASK_GROUND_TRUTH:
+            tumor_pn_map = self.__create_mask_positive_negative_map(
+                        positive_mask, negative_mask
+                    )
+        elif self.td.image_has_tumor():
             pixel_ranges = self.td.get_tumor_area_ranges()
             x_range = pixel_ranges[0]
             y_range = pixel_ranges[1]
@@ -93,6 +201,48 @@ class ImageAnalyser:
         else:
             tumor_pn_map = None
 
+        return self.__create_score_map(pn_map, tumor_pn_map)
+
+    def __create_mask_positive_negative_map(self, positive_mask, 
+            negative_mask):
+        '''Return a map containing the number of positive, negative and
+        total pixels inside the tumor mask, or None if the mask is empty.
+
+        Parameters:
+        positive_mask: A 2D boolean array marking the positive pixels.
+        negative_mask: A 2D boolean array marking the negative pixels.
+        '''
+        tumor_mask = self.tumor_mask
+        if tumor_mask.shape != positive_mask.shape[:2]:
+            height, width = positive_mask.shape[:2]
+            tumor_mask = cv2.resize(
+                        tumor_mask.astype(np.uint8), 
+                        dsize=(width, height),
+                        interpolation=cv2.INTER_NEAREST
+                    ) > 0
+
+        total = int(np.count_nonzero(tumor_mask))
+        if not total:
+            return None
+
+        return {
+                'p': int(np.count_nonzero(positive_mask & tumor_mask)),
+                'n': int(np.count_nonzero(negative_mask & tumor_mask)),
+                'total': total,
+            }
+
+    def __create_score_map(self, pn_map, tumor_pn_map):
+        '''Return a map of scores for true positives (tp), true 
+        negatives (tn), false positives (fp), and false negatives (fn).
+
+        Parameters:
+        pn_map: A map of the values of positive and negative pixels in 
+                the entire image. 
+        tumor_pn_map: A map of the values of positive and negative pixels
+                      where the tumor is located on the image. None when
+                      no tumor is present.
+        '''
+        score_map = {}
         score_map['tp'] = self.__find_true_positive(pn_map, tumor_pn_map)
         score_map['tn'] = self.__find_true_negative(pn_map, tumor_pn_map)
         score_map['fp'] = self.__find_false_positive(pn_map, tumor_pn_map)
@@ -162,8 +312,9 @@ class ImageAnalyser:
 
     def __create_positive_negative_map(self, x_start=0, y_start=0, 
             x_end=None, y_end=None):
-        '''Scan the image between start and end ranges, and return a
-        map containing the number of positive and negative pixels.
+        '''Look up the positive and negative pixels between the start and
+        end ranges, and return a map containing the number of positive 
+        and negative pixels.
 
         The keys to the map are the following strings:
             Positive Pixel Key: p
@@ -181,27 +332,7 @@ class ImageAnalyser:
         if y_end == None:
             y_end = self.xai_image.shape[1]
 
-        pn_map = {'p': 0, 'n': 0}   # positive-negative map
-
-        for y in range(y_start, y_end):
-            for x in range(x_start, x_end):
-                pixel_colour = self.xai_image[y][x]
-
-                if len(pixel_colour) == 4:
-                    #convert from RGBA to RGB
-                    pixel_colour = pixel_colour[:3]
-                
-                if pixel.is_same_saturation(pixel_colour):
-                    # neither a positive or negative colour
-                    continue
-                if pixel.is_negative(pixel_colour, self.xai_method):
-                    counter = pn_map['n'] # negative counter
-                    counter += 1
-                    pn_map['n'] = counter
-                else:
-                    counter = pn_map['p'] # positive counter
-                    counter += 1
-                    pn_map['p'] = counter
+        pn_map = self.region_stats.count(x_start, y_start, x_end, y_end)
 
         # total pixels counted
         pn_map['total'] = (x_end-x_start)*(y_end-y_start)
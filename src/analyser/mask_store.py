@@ -0,0 +1,157 @@
+'''
+    The MaskStore class holds the ground truth tumor masks of the
+    dataset images, taken from the BraTS segmentation volumes.
+
+    Masks are keyed by a hash of the cropped image pixels, so a mask is
+    found from the image alone. The masks are saved in one .npz file,
+    holding the image keys, the image names, the shape of the masks and
+    every mask packed to one bit per pixel with np.packbits. The file is
+    read once, and each lookup unpacks a single mask.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import os
+import threading
+import numpy as np
+
+MASKS_PATH = '../cache/masks/segmentations.npz'
+
+class MaskStore:
+    # stores already loaded, keyed by path
+    stores = {}
+
+    @staticmethod
+    def get_store(store_path=MASKS_PATH):
+        '''Return the MaskStore saved at the path, loading it the first
+        time it is requested.
+
+        Parameters:
+        store_path: The path to the .npz file. Default is MASKS_PATH.
+        '''
+        if store_path not in MaskStore.stores:
+            MaskStore.stores[store_path] = MaskStore(store_path)
+        return MaskStore.stores[store_path]
+
+    def __init__(self, store_path=MASKS_PATH):
+        '''Construct a MaskStore object, loading the masks saved at the
+        path when it exists.
+
+        Use get_store to share the store between analysers.
+
+        Parameters:
+        store_path: The path to the .npz file. Default is MASKS_PATH.
+        '''
+        self.store_path = store_path
+        self.shape = None
+        self.rows = {}
+        self.names = []
+        self.packed = np.zeros((0, 0), dtype=np.uint8)
+        self.added = []
+        self.lock = threading.Lock()
+        self.__load()
+
+    def has_mask(self, key):
+        '''Return True if the store holds the mask of the image.
+
+        Parameters:
+        key: The hex digest of the image hash.
+        '''
+        return key in self.rows
+
+    def get_mask(self, key):
+        '''Return the boolean mask of the tumor in the image.
+
+        Parameters:
+        key: The hex digest of the image hash.
+
+        Raises:
+        KeyError: When the store does not hold the mask of the image.
+        '''
+        if key not in self.rows:
+            raise KeyError(
+                    f'No segmentation mask for image {key}. Ingest the '
+                    'segmentations with ingest_segmentations.py.'
+                )
+
+        size = self.shape[0] * self.shape[1]
+        bits = np.unpackbits(self.packed[self.rows[key]], count=size)
+        return bits.reshape(self.shape).view(bool)
+
+    def add_mask(self, key, name, mask):
+        '''Add the mask of an image to the store, replacing any mask the
+        image has. The mask is kept in memory until the store is saved.
+
+        Parameters:
+        key: The hex digest of the image hash.
+        name: The name of the image file.
+        mask: A 2D boolean array marking the tumor pixels.
+
+        Raises:
+        ValueError: When the mask is not the shape of the other masks.
+        '''
+        mask = np.asarray(mask, dtype=bool)
+        with self.lock:
+            if self.shape is None:
+                self.shape = mask.shape
+                self.packed = np.zeros(
+                            (0, (mask.size+7) // 8), dtype=np.uint8
+                        )
+            elif mask.shape != self.shape:
+                raise ValueError(
+                        f'Mask of shape {mask.shape} does not match the '
+                        f'store shape {self.shape}.'
+                    )
+            self.added.append((key, name, np.packbits(mask)))
+
+    def save(self):
+        '''Add the masks kept in memory to the store, and save it.'''
+        with self.lock:
+            if not self.added:
+                return
+
+            packed = list(self.packed)
+            for key, name, packed_mask in self.added:
+                if key in self.rows:
+                    packed[self.rows[key]] = packed_mask
+                    self.names[self.rows[key]] = name
+                else:
+                    self.rows[key] = len(packed)
+                    packed.append(packed_mask)
+                    self.names.append(name)
+            self.packed = np.array(packed, dtype=np.uint8)
+            self.added.clear()
+
+            keys = np.zeros((len(self.rows), 20), dtype=np.uint8)
+            for key, row in self.rows.items():
+                keys[row] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+
+            directory = os.path.dirname(self.store_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f'{self.store_path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as file:
+                np.savez(
+                        file,
+                        keys=keys,
+                        names=np.array(self.names),
+                        shape=np.array(self.shape),
+                        masks=self.packed,
+                    )
+            os.replace(temp_path, self.store_path)
+
+    def __len__(self):
+        '''Return the number of masks in the store.'''
+        return len(self.rows)
+
+    def __load(self):
+        '''Load the masks saved at the store path, if it exists.'''
+        if not os.path.exists(self.store_path):
+            return
+
+        with np.load(self.store_path) as data:
+            self.shape = tuple(int(size) for size in data['shape'])
+            self.names = list(data['names'])
+            self.packed = data['masks']
+            self.rows = {key.tobytes().hex(): row
+                         for row, key in enumerate(data['keys'])}
@@ -6,6 +6,8 @@
 __author__='Dean Whitbread'
 __version__='15-09-2023'
 
+import numpy as np
+
 class PixelAnalyser:
     
     @staticmethod
@@ -46,6 +48,51 @@ class PixelAnalyser:
         elif PixelAnalyser.__is_gradcam(xai_method):
             return r>b and g>b and r>=160 and g<=160
 
+    @staticmethod
+    def get_positive_negative_masks(image, xai_method):
+        '''Return a tuple of boolean masks marking the positive and 
+        negative pixels of an explained image.
+
+        The masks are in the order: (positive_mask, negative_mask). 
+        Pixels that are in neither mask are neutral. Each pixel is 
+        classified using the same rules as is_same_saturation and 
+        is_negative, but the entire image is classified at once.
+
+        Parameters:
+        image: The explained image as a RGB or RGBA array.
+        xai_method: The name of the XAI method used to explain the image.
+        '''
+        image = np.asarray(image)
+        r, g, b = image[..., 0], image[..., 1], image[..., 2]
+
+        neutral_mask = (r==g) & (g==b)
+        negative_mask = PixelAnalyser.__get_negative_mask(r, g, b, xai_method)
+        negative_mask &= ~neutral_mask
+        positive_mask = ~(neutral_mask | negative_mask)
+
+        return (positive_mask, negative_mask)
+
+    @staticmethod
+    def __get_negative_mask(r, g, b, xai_method):
+        '''Return a boolean mask of the pixels that represent a negative 
+        pixel, ignoring the saturation of the pixel.
+
+        Parameters:
+        r: An array of the red channel values.
+        g: An array of the green channel values.
+        b: An array of the blue channel values.
+        xai_method: The name of the XAI method used to explain the image.
+        '''
+        if PixelAnalyser.__is_lime(xai_method):
+            return ~((g>r) & (g>b))
+        elif PixelAnalyser.__is_shap(xai_method):
+            return ~((r>b) & (r>g))
+        elif PixelAnalyser.__is_gradcam(xai_method):
+            return (r>b) & (g>b) & (r>=160) & (g<=160)
+        
+        # unknown methods never produce a negative pixel
+        return np.zeros(r.shape, dtype=bool)
+
     @staticmethod
     def __is_RGBA_colour(pixel_colour):
         '''Return if the pixel colour format is RGBA.
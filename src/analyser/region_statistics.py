@@ -0,0 +1,141 @@
+'''
+    The RegionStatistics class counts the positive and negative pixels
+    of an explained image inside rectangular regions.
+
+    Summed-area tables are built once from the positive and negative
+    masks, so the counts for any rectangle are found in constant time.
+    This makes it cheap to score many candidate regions, sliding windows
+    or a sweep of region sizes for the same explained image.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '17-10-2026'
+
+import numpy as np
+
+class RegionStatistics:
+    def __init__(self, positive_mask, negative_mask):
+        '''Construct a RegionStatistics object.
+
+        Parameters:
+        positive_mask: A 2D boolean array marking the positive pixels.
+        negative_mask: A 2D boolean array marking the negative pixels.
+        '''
+        self.height, self.width = positive_mask.shape[:2]
+        self.positive_table = self.__create_summed_area_table(positive_mask)
+        self.negative_table = self.__create_summed_area_table(negative_mask)
+
+    def count(self, x_start, y_start, x_end, y_end):
+        '''Return a map containing the number of positive and negative
+        pixels inside a region.
+
+        The keys to the map are the following strings:
+            Positive Pixel Key: p
+            Negative Pixel Key: n
+            Total Pixel Key: total
+
+        Coordinates outside of the image are clipped to the image edge.
+
+        Parameters:
+        x_start: The first x-coordinate of the region.
+        y_start: The first y-coordinate of the region.
+        x_end: The x-coordinate after the last column of the region.
+        y_end: The y-coordinate after the last row of the region.
+        '''
+        p, n, total = self.count_regions(x_start, y_start, x_end, y_end)
+        return {'p': int(p), 'n': int(n), 'total': int(total)}
+
+    def count_regions(self, x_start, y_start, x_end, y_end):
+        '''Return a tuple of arrays containing the number of positive,
+        negative and total pixels inside each region.
+
+        The arrays are in the order: (positive, negative, total). The
+        arguments are integers or arrays of integers, where the values
+        at the same index describe one region.
+
+        Parameters:
+        x_start: The first x-coordinates of the regions.
+        y_start: The first y-coordinates of the regions.
+        x_end: The x-coordinates after the last column of the regions.
+        y_end: The y-coordinates after the last row of the regions.
+        '''
+        x_start = np.clip(x_start, 0, self.width)
+        x_end = np.clip(x_end, x_start, self.width)
+        y_start = np.clip(y_start, 0, self.height)
+        y_end = np.clip(y_end, y_start, self.height)
+
+        positive = self.__sum_table(
+                    self.positive_table, x_start, y_start, x_end, y_end
+                )
+        negative = self.__sum_table(
+                    self.negative_table, x_start, y_start, x_end, y_end
+                )
+        total = (x_end-x_start) * (y_end-y_start)
+
+        return (positive, negative, total)
+
+    def sliding_window(self, window_width, window_height, stride=1):
+        '''Return a tuple of 2D arrays containing the number of positive,
+        negative and total pixels for every window position.
+
+        The arrays are in the order: (positive, negative, total) and are
+        indexed by [row, column] of the window position.
+
+        Parameters:
+        window_width: The width of the window in pixels.
+        window_height: The height of the window in pixels.
+        stride: The number of pixels the window moves. Default is 1.
+        '''
+        y_starts = np.arange(0, self.height-window_height+1, stride)
+        x_starts = np.arange(0, self.width-window_width+1, stride)
+        y_start, x_start = np.meshgrid(y_starts, x_starts, indexing='ij')
+
+        return self.count_regions(
+                    x_start, y_start,
+                    x_start+window_width, y_start+window_height
+                )
+
+    def region_size_sweep(self, x, y, half_sizes):
+        '''Return a tuple of arrays containing the number of positive,
+        negative and total pixels for square regions of increasing size
+        centred on a pixel.
+
+        The arrays are in the order: (positive, negative, total).
+
+        Parameters:
+        x: The x-coordinate of the centre of the regions.
+        y: The y-coordinate of the centre of the regions.
+        half_sizes: A list of distances from the centre to the edge of
+                    each region.
+        '''
+        half_sizes = np.asarray(half_sizes)
+        return self.count_regions(
+                    x-half_sizes, y-half_sizes, x+half_sizes, y+half_sizes
+                )
+
+    def __create_summed_area_table(self, mask):
+        '''Return the summed-area table of a mask.
+
+        The table has an extra row and column of zeros, so the value at
+        [y, x] is the sum of the mask above and to the left of (x, y).
+
+        Parameters:
+        mask: A 2D boolean array.
+        '''
+        table = np.zeros((self.height+1, self.width+1), dtype=np.int64)
+        np.cumsum(mask, axis=0, out=table[1:, 1:])
+        np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+        return table
+
+    def __sum_table(self, table, x_start, y_start, x_end, y_end):
+        '''Return the sum of the mask inside the regions using the
+        summed-area table.
+
+        Parameters:
+        table: The summed-area table of the mask.
+        x_start: The first x-coordinates of the regions.
+        y_start: The first y-coordinates of the regions.
+        x_end: The x-coordinates after the last column of the regions.
+        y_end: The y-coordinates after the last row of the regions.
+        '''
+        return (table[y_end, x_end] - table[y_start, x_end]
+                - table[y_end, x_start] + table[y_start, x_start])
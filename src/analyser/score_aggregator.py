@@ -0,0 +1,195 @@
+'''
+    The ScoreAggregator class keeps the statistics of the scores of an
+    explainable AI (XAI) tool as images are analysed, without keeping
+    the scores of each image.
+
+    Each image adds its tp, tn, fp and fn counts. The aggregator keeps
+    the summed counts, which give the micro averages, and the count,
+    mean and sum of squared differences from the mean of each per-image
+    score, which give the macro averages and variances (Welford's
+    algorithm). The statistics are kept for all images and for the
+    tumour and non-tumour images separately.
+
+    Aggregators of the same tool built from separate workers or shards
+    of the dataset are combined with the merge method.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+from analyser.image_analyser import ImageAnalyser
+
+METRICS = ('accuracy', 'precision', 'recall', 'f1')
+COUNT_KEYS = ('tp', 'tn', 'fp', 'fn')
+
+# the groups of images, where None is all images
+GROUPS = (None, True, False)
+
+def get_scores(score_map):
+    '''Return a map of the accuracy, precision, recall and F1 scores of
+    a score map.
+
+    Parameters:
+    score_map: A map of the tp, tn, fp and fn of an explained image.
+    '''
+    return {
+            'accuracy': ImageAnalyser.accuracy(score_map),
+            'precision': ImageAnalyser.precision(score_map),
+            'recall': ImageAnalyser.recall(score_map),
+            'f1': ImageAnalyser.f1(score_map),
+        }
+
+class RunningStatistic:
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        '''Construct a RunningStatistic object.
+
+        Parameters:
+        count: The number of values added. Default is 0.
+        mean: The mean of the values. Default is 0.0.
+        m2: The sum of squared differences from the mean. Default is
+            0.0.
+        '''
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value):
+        '''Add a value to the statistic.
+
+        Parameters:
+        value: The value added.
+        '''
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        '''Add the values of another RunningStatistic object to the
+        statistic.
+
+        Parameters:
+        other: The RunningStatistic object merged.
+        '''
+        count = self.count + other.count
+        if not count:
+            return
+
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta**2 * self.count * other.count / count
+        self.count = count
+
+    def get_variance(self):
+        '''Return the sample variance of the values, or 0 if fewer than
+        two values were added.'''
+        return self.m2 / (self.count-1) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        '''Return a map of the statistic, which can be saved as JSON.'''
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2}
+
+class ScoreAggregator:
+    def __init__(self):
+        '''Construct a ScoreAggregator object.'''
+        self.counts = {group: dict.fromkeys(COUNT_KEYS, 0)
+                       for group in GROUPS}
+        self.statistics = {
+                    group: {metric: RunningStatistic() for metric in METRICS}
+                    for group in GROUPS
+                }
+
+    def add(self, score_map, tumour_present):
+        '''Add the scores of an image, and return a map of its accuracy,
+        precision, recall and F1 scores.
+
+        Parameters:
+        score_map: A map of the tp, tn, fp and fn of the explained image.
+        tumour_present: True if the model predicts a tumour in the image.
+        '''
+        scores = get_scores(score_map)
+        for group in (None, bool(tumour_present)):
+            for key in COUNT_KEYS:
+                self.counts[group][key] += score_map[key]
+            for metric in METRICS:
+                self.statistics[group][metric].add(scores[metric])
+
+        return scores
+
+    def merge(self, other):
+        '''Add the scores held by another ScoreAggregator object.
+
+        Parameters:
+        other: The ScoreAggregator object merged.
+        '''
+        for group in GROUPS:
+            for key in COUNT_KEYS:
+                self.counts[group][key] += other.counts[group][key]
+            for metric in METRICS:
+                self.statistics[group][metric].merge(
+                            other.statistics[group][metric]
+                        )
+
+    def get_count(self, tumour_present=None):
+        '''Return the number of images added.
+
+        Parameters:
+        tumour_present: If True or False, only count the tumour or
+                        non-tumour images. Default is None, which counts
+                        all images.
+        '''
+        return self.statistics[tumour_present]['accuracy'].count
+
+    def get_macro(self, metric, tumour_present=None):
+        '''Return the mean of the per-image scores of a metric.
+
+        Parameters:
+        metric: Either 'accuracy', 'precision', 'recall' or 'f1'.
+        tumour_present: If True or False, only use the tumour or
+                        non-tumour images. Default is None, which uses
+                        all images.
+        '''
+        return self.statistics[tumour_present][metric].mean
+
+    def get_variance(self, metric, tumour_present=None):
+        '''Return the sample variance of the per-image scores of a
+        metric.
+
+        Parameters:
+        metric: Either 'accuracy', 'precision', 'recall' or 'f1'.
+        tumour_present: If True or False, only use the tumour or
+                        non-tumour images. Default is None, which uses
+                        all images.
+        '''
+        return self.statistics[tumour_present][metric].get_variance()
+
+    def get_micro(self, metric, tumour_present=None):
+        '''Return the score of a metric computed from the tp, tn, fp and
+        fn summed over the images, or 0 if no images were added.
+
+        Parameters:
+        metric: Either 'accuracy', 'precision', 'recall' or 'f1'.
+        tumour_present: If True or False, only use the tumour or
+                        non-tumour images. Default is None, which uses
+                        all images.
+        '''
+        if not self.get_count(tumour_present):
+            return 0
+        return get_scores(self.counts[tumour_present])[metric]
+
+    def get_summary(self):
+        '''Return a map of the statistics of each group of images, which
+        can be saved as JSON. The groups are 'all', 'tumour' and
+        'non_tumour'.'''
+        names = {None: 'all', True: 'tumour', False: 'non_tumour'}
+        summary = {}
+        for group in GROUPS:
+            summary[names[group]] = {
+                    'images': self.get_count(group),
+                    'counts': dict(self.counts[group]),
+                    **{metric: {
+                            'macro': self.get_macro(metric, group),
+                            'variance': self.get_variance(metric, group),
+                            'micro': self.get_micro(metric, group),
+                        } for metric in METRICS},
+                }
+        return summary
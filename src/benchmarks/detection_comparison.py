@@ -0,0 +1,200 @@
+'''
+    The detection_comparison script compares the tumor regions the
+    TumorDetector detects with the regions saved in the region index, on
+    the time taken to find the region of each image and on how often
+    both agree on the tumor found.
+
+    Use it to check that the regions saved by index_regions.py still
+    match the detector, and how much faster reading a saved region is
+    than detecting it. Fresh regions are detected into empty indexes in
+    a temporary directory, so no saved region is reused. Execute from 
+    the src folder using:
+        python -m benchmarks.detection_comparison --images 200
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import argparse
+import tempfile
+import time
+from misc.image_selector import ImageSelector
+from misc.lazy_dataset import LazyDataset
+from analyser.detector.region_index import RegionIndex, REGIONS_PATH
+from analyser.detector.tumor_detector import TumorDetector, DETECTOR_PARAMS
+
+DATASET_PATH = '../dataset/images_used'
+NUM_IMAGES = 200
+REPEATS = 3
+
+# the pixels the centre and radius may differ by for circles to agree
+TOLERANCE = 3
+
+def detect_regions(images, repeats=REPEATS):
+    '''Return a tuple of the list of regions detected in each image and
+    the mean seconds taken to detect a region, using the fastest of the
+    repeats.
+
+    Parameters:
+    images: A list of the MRI images.
+    repeats: The number of times the images are detected. Default is
+             REPEATS.
+    '''
+    best_time = None
+    with tempfile.TemporaryDirectory() as regions_path:
+        for _ in range(repeats):
+            region_index = RegionIndex(DETECTOR_PARAMS, regions_path)
+            start = time.perf_counter()
+            for image in images:
+                TumorDetector(image, region_index)
+            elapsed = time.perf_counter() - start
+
+            if best_time is None or elapsed < best_time:
+                best_time = elapsed
+
+    regions = [region_index.get_region(TumorDetector.get_image_key(image))
+               for image in images]
+    return (regions, best_time / len(images))
+
+def read_regions(images, region_index, repeats=REPEATS):
+    '''Return a tuple of the list of regions saved in the index for each
+    image, or None for images missing from the index, and the mean
+    seconds taken to read a region, using the fastest of the repeats.
+
+    Parameters:
+    images: A list of the MRI images.
+    region_index: The RegionIndex holding the saved regions.
+    repeats: The number of times the regions are read. Default is
+             REPEATS.
+    '''
+    best_time = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        regions = []
+        for image in images:
+            key = TumorDetector.get_image_key(image)
+            regions.append(region_index.get_region(key)
+                           if region_index.has_region(key) else None)
+        elapsed = time.perf_counter() - start
+
+        if best_time is None or elapsed < best_time:
+            best_time = elapsed
+
+    return (regions, best_time / len(images))
+
+def get_box_overlap(box, other_box):
+    '''Return the intersection over union of two boxes.
+
+    Parameters:
+    box: A tuple of the x_start, y_start, x_end and y_end of a box.
+    other_box: A tuple of the x_start, y_start, x_end and y_end of the
+               other box.
+    '''
+    width = min(box[2], other_box[2]) - max(box[0], other_box[0])
+    height = min(box[3], other_box[3]) - max(box[1], other_box[1])
+    intersection = max(0, width) * max(0, height)
+    area = lambda b: (b[2]-b[0]) * (b[3]-b[1])
+    union = area(box) + area(other_box) - intersection
+    return intersection / union if union else 0
+
+def compare_regions(regions, baseline_regions):
+    '''Return a map of the agreement of the regions with the baseline
+    regions. Images without a region in either list are left out.
+
+    Parameters:
+    regions: A list of the (circle, box) of each image, or None.
+    baseline_regions: A list of the (circle, box) of each image found by
+                      the baseline, or None.
+    '''
+    results = {
+            'images': 0, 'found': 0, 'presence': 0, 'exact': 0,
+            'close': 0, 'iou': 0,
+        }
+    both_found = 0
+
+    for region, baseline_region in zip(regions, baseline_regions):
+        if region is None or baseline_region is None:
+            continue
+
+        (circle, box), (baseline_circle, baseline_box) = (
+                    region, baseline_region
+                )
+        results['images'] += 1
+        results['found'] += circle is not None
+        results['presence'] += (circle is None) == (baseline_circle is None)
+
+        if circle is None and baseline_circle is None:
+            results['exact'] += 1
+            results['close'] += 1
+        elif circle is not None and baseline_circle is not None:
+            both_found += 1
+            results['exact'] += circle == baseline_circle
+            results['close'] += max(abs(value - baseline_value)
+                    for value, baseline_value in zip(circle, baseline_circle)
+                ) <= TOLERANCE
+            results['iou'] += get_box_overlap(box, baseline_box)
+
+    for name in ('presence', 'exact', 'close'):
+        if results['images']:
+            results[name] /= results['images']
+    results['iou'] = results['iou'] / both_found if both_found else 0
+
+    return results
+
+def display_results(results, times):
+    '''Print a table of the agreement of the saved regions with the
+    detected regions, and the speedup of each over the detection.
+
+    Parameters:
+    results: A map of the names of the regions to their agreement
+             results.
+    times: A map of the names of the regions to the mean seconds per
+           image.
+    '''
+    columns = ['images', 'found', 'presence', 'exact', 'close', 'iou']
+    print('regions'.ljust(12) + ''.join(c.rjust(10) for c in columns)
+          + 'ms/image'.rjust(12) + 'speedup'.rjust(10))
+    for name, result in results.items():
+        speedup = times['detected'] / times[name] if times[name] else 0
+        print(name.ljust(12)
+              + ''.join(f'{result[c]:10d}' for c in columns[:2])
+              + ''.join(f'{result[c]:10.4f}' for c in columns[2:])
+              + f'{times[name]*1000:12.3f}' + f'{speedup:10.2f}')
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dataset', default=DATASET_PATH,
+                        help='path to the folder of dataset images')
+    parser.add_argument('--images', type=int, default=NUM_IMAGES,
+                        help='number of images detected, or 0 for every '
+                             'image')
+    parser.add_argument('--repeats', type=int, default=REPEATS,
+                        help='number of timed detections of the images')
+    parser.add_argument('--reference-dir', default=REGIONS_PATH,
+                        help='directory of the saved region index the '
+                             'detected regions are compared with')
+    args = parser.parse_args()
+
+    paths = ImageSelector(args.dataset).get_image_paths()
+    if args.images:
+        paths = paths[:args.images]
+    dataset = LazyDataset(paths)
+    images = [dataset.get_image(index) for index in range(len(paths))]
+
+    print(f'Detecting tumours in {len(images)} images...')
+    regions, times = {}, {}
+    regions['detected'], times['detected'] = detect_regions(
+                images, args.repeats
+            )
+    regions['indexed'], times['indexed'] = read_regions(
+                images,
+                RegionIndex(DETECTOR_PARAMS, args.reference_dir),
+                args.repeats
+            )
+
+    missing = regions['indexed'].count(None)
+    if missing:
+        print(f'{missing} images are missing from the saved index.')
+
+    results = {name: compare_regions(regions[name], regions['detected'])
+               for name in regions}
+    display_results(results, times)
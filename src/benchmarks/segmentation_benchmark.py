@@ -0,0 +1,88 @@
+'''
+    The segmentation_benchmark script compares the segmenters available
+    to LIME on the time taken to segment an image, the time taken to
+    explain an image and the ImageAnalyser scores of the explanations.
+
+    Execute from the src folder using:
+        python -m benchmarks.segmentation_benchmark --images 20
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '17-10-2026'
+
+print('Welcome!\nLoading imports...')
+
+import argparse
+import time
+from tensorflow.keras.models import load_model
+from misc.image_selector import ImageSelector
+from xai.lime_xai_factory import LimeXaiFactory
+from xai.tools.segmentation import Segmenter, SEGMENTER_PARAMS
+from analyser.image_analyser import ImageAnalyser
+
+DATASET_PATH = '../dataset/images_used'
+MODEL_PATH = '../models/cnn-parameters-improvement-23-0.91.model'
+NUM_IMAGES = 20
+
+def benchmark_segmenter(segmenter, paths, model):
+    '''Return a map of the mean segmentation time, explanation time and
+    scores of LIME explanations using the segmenter.
+
+    Parameters:
+    segmenter: The Segmenter object being benchmarked.
+    paths: A list of directory paths to the images explained.
+    model: The classifcation model used to classify the images.
+    '''
+    totals = {
+            'segment_time': 0, 'explain_time': 0, 'segments': 0,
+            'accuracy': 0, 'precision': 0, 'recall': 0, 'f1': 0,
+        }
+
+    for path in paths:
+        xai = LimeXaiFactory(path, model, segmenter=segmenter)
+
+        start = time.perf_counter()
+        segments = segmenter(xai.get_target_image())
+        totals['segment_time'] += time.perf_counter() - start
+        totals['segments'] += len(set(segments.ravel()))
+
+        start = time.perf_counter()
+        analyser = ImageAnalyser(xai.get_xai_tool())
+        totals['explain_time'] += time.perf_counter() - start
+
+        totals['accuracy'] += analyser.accuracy_score()
+        totals['precision'] += analyser.precision_score()
+        totals['recall'] += analyser.recall_score()
+        totals['f1'] += analyser.f1_score()
+
+    return {name: total / len(paths) for name, total in totals.items()}
+
+def display_results(results):
+    '''Print a table of the benchmark results of each segmenter.
+
+    Parameters:
+    results: A map of segmenter names to their benchmark results.
+    '''
+    columns = ['segment_time', 'explain_time', 'segments', 'accuracy',
+               'precision', 'recall', 'f1']
+    print('segmenter'.ljust(16) + ''.join(c.rjust(14) for c in columns))
+    for name, result in results.items():
+        print(name.ljust(16) + ''.join(
+                    f'{result[c]:14.4f}' for c in columns
+                ))
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--images', type=int, default=NUM_IMAGES,
+                        help='number of images to explain per segmenter')
+    args = parser.parse_args()
+
+    model = load_model(MODEL_PATH)
+    paths = ImageSelector(DATASET_PATH).get_image_paths()[:args.images]
+
+    results = {}
+    for algo_type in SEGMENTER_PARAMS:
+        print(f'Benchmarking {algo_type}...')
+        segmenter = Segmenter(algo_type)
+        results[algo_type] = benchmark_segmenter(segmenter, paths, model)
+
+    display_results(results)
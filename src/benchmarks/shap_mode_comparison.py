@@ -0,0 +1,95 @@
+'''
+    The shap_mode_comparison script compares the SHAP modes on the time
+    taken to explain an image, the model evaluations used and the 
+    ImageAnalyser scores of the explanations. The partition mode is
+    compared with a fixed and an adaptive evaluation budget.
+
+    Execute from the src folder using:
+        python -m benchmarks.shap_mode_comparison --images 20
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+print('Welcome!\nLoading imports...')
+
+import argparse
+import time
+from tensorflow.keras.models import load_model
+from misc.image_selector import ImageSelector
+from xai.shap_xai_factory import ShapXaiFactory
+from analyser.image_analyser import ImageAnalyser
+
+DATASET_PATH = '../dataset/images_used'
+MODEL_PATH = '../models/cnn-parameters-improvement-23-0.91.model'
+NUM_IMAGES = 20
+SCORES = ['accuracy', 'precision', 'recall', 'f1']
+CONFIGURATIONS = {
+        'partition': {'mode': 'partition'},
+        'adaptive': {'mode': 'partition', 'adaptive': True},
+        'gradient': {'mode': 'gradient'},
+    }
+
+def compare_modes(paths, model, images):
+    '''Return a map of SHAP configurations to a map of their mean 
+    explanation time, evaluations used and scores.
+
+    Parameters:
+    paths: A list of directory paths to the images explained.
+    model: The classifcation model used to classify the images.
+    images: The DatasetStore of the dataset images used by the SHAP
+            explainers.
+    '''
+    results = {name: {'time': 0, 'evals': 0, **{s: 0 for s in SCORES}}
+               for name in CONFIGURATIONS}
+
+    for index, path in enumerate(paths):
+        print(f'Explaining image {index+1} of {len(paths)}...')
+        for name, config in CONFIGURATIONS.items():
+            xai = ShapXaiFactory(path, model, images, **config)
+
+            start = time.perf_counter()
+            tool = xai.get_xai_tool()
+            analyser = ImageAnalyser(tool)
+            results[name]['time'] += time.perf_counter() - start
+            results[name]['evals'] += tool.get_evaluations_used()
+
+            results[name]['accuracy'] += analyser.accuracy_score()
+            results[name]['precision'] += analyser.precision_score()
+            results[name]['recall'] += analyser.recall_score()
+            results[name]['f1'] += analyser.f1_score()
+
+    for result in results.values():
+        for name in result:
+            result[name] /= len(paths)
+
+    return results
+
+def display_results(results):
+    '''Print a table of the comparison results of each SHAP 
+    configuration, and the speedup of each over the first.
+
+    Parameters:
+    results: A map of SHAP configurations to their comparison results.
+    '''
+    columns = ['time', 'evals'] + SCORES
+    baseline = results[next(iter(CONFIGURATIONS))]['time']
+    print('mode'.ljust(12) + ''.join(c.rjust(12) for c in columns)
+          + 'speedup'.rjust(12))
+    for name, result in results.items():
+        speedup = baseline / result['time'] if result['time'] else 0
+        print(name.ljust(12)
+              + ''.join(f'{result[c]:12.4f}' for c in columns)
+              + f'{speedup:12.2f}')
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--images', type=int, default=NUM_IMAGES,
+                        help='number of images to explain per configuration')
+    args = parser.parse_args()
+
+    model = load_model(MODEL_PATH)
+    selector = ImageSelector(DATASET_PATH)
+    paths = selector.get_image_paths()[:args.images]
+    images = selector.get_dataset_images()
+
+    display_results(compare_modes(paths, model, images))
@@ -10,17 +10,33 @@ __version__='06-08-2023'
 
 import os
 from datetime import datetime
-from doc_writer.file import File
+from doc_writer.file import File, RESULTS_PATH, FLUSH_SIZE
 
 CSV_TITLES = 'id,accuracy,precision,recall,f1,tumour_present'
+SHAP_EVALUATIONS_TITLES = 'id,max_evals,evaluations_used,converged'
 
 class CsvWriter:
-    def __init__(self):
-        '''Construct a CsvWriter object.'''
+    def __init__(self, results_path=RESULTS_PATH, flush_size=FLUSH_SIZE):
+        '''Construct a CsvWriter object.
+
+        Parameters:
+        results_path: The directory where the csv files are saved.
+                      Default is RESULTS_PATH.
+        flush_size: The number of buffered rows written to a file at 
+                    once. Default is FLUSH_SIZE.
+        '''
         timestamp = datetime.now().strftime('%d-%m-%Y-%H-%M-%S')
-        self.lime_csv = File(f'lime-{timestamp}.csv', CSV_TITLES)
-        self.gradcam_csv = File(f'gradcam-{timestamp}.csv', CSV_TITLES)
-        self.shap_csv = File(f'shap-{timestamp}.csv', CSV_TITLES)
+        options = {'results_path': results_path, 'flush_size': flush_size}
+        self.lime_csv = File(f'lime-{timestamp}.csv', CSV_TITLES, **options)
+        self.gradcam_csv = File(
+                    f'gradcam-{timestamp}.csv', CSV_TITLES, **options
+                )
+        self.shap_csv = File(f'shap-{timestamp}.csv', CSV_TITLES, **options)
+        self.shap_evaluations_csv = File(
+                    f'shap-evaluations-{timestamp}.csv',
+                    SHAP_EVALUATIONS_TITLES,
+                    **options
+                )
 
     def get_lime_csv_file(self):
         '''Return the csv file for XAI tool.'''
@@ -33,3 +49,23 @@ class CsvWriter:
     def get_shap_csv_file(self):
         '''Return the csv file for XAI tool.'''
         return self.shap_csv
+
+    def get_shap_evaluations_csv_file(self):
+        '''Return the csv file recording the model evaluations used by
+        SHAP for each image.'''
+        return self.shap_evaluations_csv
+
+    def get_files(self):
+        '''Return a list of every csv file.'''
+        return [self.lime_csv, self.gradcam_csv, self.shap_csv,
+                self.shap_evaluations_csv]
+
+    def flush(self):
+        '''Write the buffered rows of every csv file.'''
+        for file in self.get_files():
+            file.flush()
+
+    def close(self):
+        '''Write the buffered rows and close every csv file.'''
+        for file in self.get_files():
+            file.close()
@@ -1,61 +1,95 @@
 '''
-    The File class represents a new file in the system. 
+    The File class represents a new file in the system.
 
-    The file is saved within the 'results' subdirectory and the extension
-    of the filetype (.txt, .csv, etc) must be included in the 'filename'
-    when initialising the File object.
+    The file is saved within the results directory, which is the
+    'results' folder by default, and the extension of the filetype
+    (.txt, .csv, etc) must be included in the 'filename' when
+    initialising the File object.
+
+    The file is held open while it is used. Messages are buffered and
+    written in batches, and may be written from multiple threads.
 '''
 __author__='Dean Whitbread'
-__version__='06-08-2023'
+__version__='18-10-2026'
 
 import os
+import threading
 
 RESULTS_PATH = '../results'
-SRC_PATH = '../src'
+FLUSH_SIZE = 32
 
 class File:
-    def __init__(self, filename, initial_message=None):
+    def __init__(self, filename, initial_message=None,
+            results_path=RESULTS_PATH, flush_size=FLUSH_SIZE):
         '''Construct a new File object.
-        
-        filename: The name of the new file. 
-        initial_message: Initialise the file with a message. Default is 
-                         None. 
+
+        filename: The name of the new file.
+        initial_message: Initialise the file with a message. Default is
+                         None.
+        results_path: The directory where the file is saved. Default is
+                      RESULTS_PATH.
+        flush_size: The number of buffered messages written to the file
+                    at once. Default is FLUSH_SIZE.
         '''
-        new_file = self.__create_file(filename, initial_message)
-        self.filename = new_file.name
+        self.filename = filename
+        self.path = os.path.join(results_path, filename)
+        self.flush_size = flush_size
+        self.buffer = []
+        self.is_empty = True
+        self.lock = threading.Lock()
+        self.file = self.__create_file(results_path, initial_message)
+
+    def __create_file(self, results_path, initial_message):
+        '''Create and return a new file opened inside the results
+        directory.
 
-    def __create_file(self, filename, initial_message):
-        '''Create a new file saved inside the 'results' sub-directoy.
-        
         Parameters:
-        filename: The name of the file. 
+        results_path: The directory where the file is saved.
         initial_message: Initialise the file with a message. Default is
                          None.
         '''
-        os.chdir(RESULTS_PATH)
-        csv_file = open(filename, 'w')
+        os.makedirs(results_path, exist_ok=True)
+        new_file = open(self.path, 'w')
 
         if initial_message:
-            csv_file.write(initial_message)
-        
-        csv_file.close()
-        os.chdir(SRC_PATH)
+            new_file.write(initial_message)
+            new_file.flush()
+            self.is_empty = False
 
-        return csv_file
+        return new_file
 
     def write(self, message):
-        '''Write a new message to the file.
+        '''Add a new message to the file. Messages are written once
+        flush_size messages are buffered, or when the file is flushed.
 
         Parameters:
         message: The message to add to the file.
         '''
-        os.chdir(RESULTS_PATH)
-
-        with open(self.filename, 'r') as file:
-            if not len(file.readlines())==0:
+        with self.lock:
+            if not self.is_empty:
                 message = '\n' + message
+            self.is_empty = False
+            self.buffer.append(message)
+
+            if len(self.buffer) >= self.flush_size:
+                self.__write_buffer()
+
+    def flush(self):
+        '''Write the buffered messages to the file.'''
+        with self.lock:
+            self.__write_buffer()
+
+    def close(self):
+        '''Write the buffered messages and close the file.'''
+        with self.lock:
+            if not self.file.closed:
+                self.__write_buffer()
+                self.file.close()
 
-        with open(self.filename, 'a') as file:
-            file.write(message)
-            file.close()
-        os.chdir(SRC_PATH)
+    def __write_buffer(self):
+        '''Write the buffered messages to the file. The lock must be
+        held by the caller.'''
+        if self.buffer:
+            self.file.write(''.join(self.buffer))
+            self.buffer.clear()
+        self.file.flush()
@@ -0,0 +1,367 @@
+'''
+    The ResultsDatabase class stores the results of experiment runs in a
+    SQLite database, so runs, tools and checkpoints can be compared with
+    a query instead of by joining csv files.
+
+    The database holds a table of runs, images, tools, per-image scores
+    and failed tasks. It is opened in write-ahead logging (WAL) mode, so
+    it can be read while a run is writing, and rows are buffered and
+    inserted in batches, each in one transaction. Writers in other
+    processes wait for the database lock instead of failing.
+
+    The format_results function formats the summary printed at the end
+    of a run.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import os
+import pathlib
+import sqlite3
+import threading
+from datetime import datetime
+
+DATABASE_PATH = '../results/results.db'
+FLUSH_SIZE = 32
+BUSY_TIMEOUT = 60
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started TEXT NOT NULL,
+    checkpoint TEXT NOT NULL,
+    paths TEXT NOT NULL,
+    shap_adaptive INTEGER NOT NULL,
+    ground_truth TEXT NOT NULL DEFAULT 'region',
+    detection_mode TEXT NOT NULL DEFAULT 'full'
+);
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    image_id TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS tools (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS scores (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    image_id INTEGER NOT NULL REFERENCES images(id),
+    tool_id INTEGER NOT NULL REFERENCES tools(id),
+    position INTEGER NOT NULL,
+    tumour_present INTEGER NOT NULL,
+    tp INTEGER NOT NULL,
+    tn INTEGER NOT NULL,
+    fp INTEGER NOT NULL,
+    fn INTEGER NOT NULL,
+    accuracy REAL NOT NULL,
+    precision REAL NOT NULL,
+    recall REAL NOT NULL,
+    f1 REAL NOT NULL,
+    running_accuracy REAL NOT NULL,
+    running_precision REAL NOT NULL,
+    running_recall REAL NOT NULL,
+    running_f1 REAL NOT NULL,
+    PRIMARY KEY (run_id, tool_id, image_id)
+);
+CREATE TABLE IF NOT EXISTS failures (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    image_id INTEGER NOT NULL REFERENCES images(id),
+    tool_id INTEGER NOT NULL REFERENCES tools(id),
+    type TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_checkpoint ON runs(checkpoint);
+CREATE INDEX IF NOT EXISTS scores_image ON scores(image_id);
+CREATE INDEX IF NOT EXISTS scores_tool ON scores(tool_id, run_id);
+CREATE INDEX IF NOT EXISTS scores_tumour ON scores(tumour_present, tool_id);
+CREATE INDEX IF NOT EXISTS scores_position ON scores(run_id, tool_id, position);
+CREATE INDEX IF NOT EXISTS failures_run ON failures(run_id, tool_id);
+'''
+
+# columns added to the runs table after it was first released, with
+# their definitions. They are added to older databases when opened
+RUN_COLUMNS = {
+            'ground_truth': "TEXT NOT NULL DEFAULT 'region'",
+            'detection_mode': "TEXT NOT NULL DEFAULT 'full'",
+        }
+
+RUN_INDEXES = '''
+CREATE INDEX IF NOT EXISTS runs_ground_truth ON runs(ground_truth);
+CREATE INDEX IF NOT EXISTS runs_detection_mode ON runs(detection_mode);
+'''
+
+def format_results(p_score_map, r_score_map, acc_score_map, f1_score_map,
+        failures=None):
+    '''Return the overall scores of each XAI tool as a string.
+
+    Parameters:
+    p_score_map: A map of tool names to their precision score.
+    r_score_map: A map of tool names to their recall score.
+    acc_score_map: A map of tool names to their accuracy score.
+    f1_score_map: A map of tool names to their F1 score.
+    failures: A map of the number of failed tasks of each tool. Default
+              is None.
+    '''
+    output = ""
+    for name in p_score_map.keys():
+        output += (f"{name.title()}:\n"+(" " * 5)
+                +f"Accuracy Score: {acc_score_map[name]}\n"+(" " * 5)
+                +f"Precision Score: {p_score_map[name]}\n"+(" " * 5)
+                +f"Recall Score: {r_score_map[name]}\n"+(" " * 5)
+                +f"F1 Score: {f1_score_map[name]}\n"
+        )
+        if failures and failures.get(name):
+            output += (" " * 5)+f"Failed Tasks: {failures[name]}\n"
+    return output
+
+class ResultsDatabase:
+    def __init__(self, database_path=DATABASE_PATH, flush_size=FLUSH_SIZE,
+            read_only=False):
+        '''Construct a ResultsDatabase object, creating the database
+        when it does not exist.
+
+        Parameters:
+        database_path: The path to the database file. Default is
+                       DATABASE_PATH.
+        flush_size: The number of buffered rows inserted at once.
+                    Default is FLUSH_SIZE.
+        read_only: If True, the existing database is opened for queries
+                   only, and is never created. Default is False.
+
+        Raises:
+        FileNotFoundError: When read_only is True and the database does
+                           not exist.
+        '''
+        self.flush_size = flush_size
+        self.buffer = []
+        self.ids = {}
+        self.run_id = None
+        self.lock = threading.Lock()
+
+        if read_only:
+            if not os.path.isfile(database_path):
+                raise FileNotFoundError(
+                        f'No results database at {database_path}.'
+                    )
+            uri = pathlib.Path(database_path).resolve().as_uri()
+            self.connection = sqlite3.connect(
+                        f'{uri}?mode=ro',
+                        uri=True,
+                        timeout=BUSY_TIMEOUT,
+                        check_same_thread=False,
+                    )
+            return
+
+        directory = os.path.dirname(database_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(
+                    database_path,
+                    timeout=BUSY_TIMEOUT,
+                    check_same_thread=False,
+                )
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.__add_run_columns()
+            self.connection.executescript(RUN_INDEXES)
+
+    def start_run(self, run, tool_names):
+        '''Add a new run to the database, and return its id. Scores are
+        added to the latest run started.
+
+        Parameters:
+        run: A map identifying the run, holding the checkpoint, a hash
+             of the image paths, whether SHAP was adaptive, the ground 
+             truth scored against and the tumor detection mode.
+        tool_names: A list of the names of the XAI tools, in the order
+                    their scores are displayed.
+        '''
+        with self.lock, self.connection:
+            for tool_name in tool_names:
+                self.__get_id('tools', 'name', tool_name)
+            cursor = self.connection.execute(
+                        'INSERT INTO runs (started, checkpoint, paths, '
+                        'shap_adaptive, ground_truth, detection_mode) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        (datetime.now().isoformat(), run['checkpoint'],
+                         run['paths'], int(run['shap_adaptive']),
+                         run['ground_truth'], run['detection_mode']),
+                    )
+            self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def add_score(self, image_id, tool_name, position, tumour_present,
+            score_map, scores, running_scores):
+        '''Buffer the scores of a tool on an image.
+
+        Parameters:
+        image_id: The name of the image file.
+        tool_name: The name of the XAI tool.
+        position: The number of dataset images read up to and including
+                  the image.
+        tumour_present: True if the model predicts a tumour.
+        score_map: A map of the tp, tn, fp and fn of the explained image.
+        scores: A tuple of the accuracy, precision, recall and F1 scores
+                of the image.
+        running_scores: A tuple of the mean accuracy, precision, recall
+                        and F1 scores of the images of the tool scored so
+                        far in the run.
+        '''
+        row = ('score', image_id, tool_name, position, int(tumour_present),
+               *(int(score_map[key]) for key in ('tp', 'tn', 'fp', 'fn')),
+               *(float(score) for score in scores),
+               *(float(score) for score in running_scores))
+        self.__add_row(row)
+
+    def add_failure(self, image_id, tool_name, error):
+        '''Buffer a failed task of a tool on an image.
+
+        Parameters:
+        image_id: The name of the image file.
+        tool_name: The name of the XAI tool.
+        error: A map describing the error, holding its type and message.
+        '''
+        self.__add_row(
+                    ('failure', image_id, tool_name, error['type'],
+                     error['message'])
+                )
+
+    def flush(self):
+        '''Insert the buffered rows in one transaction.'''
+        with self.lock:
+            self.__insert_buffer()
+
+    def close(self):
+        '''Insert the buffered rows and close the database.'''
+        with self.lock:
+            self.__insert_buffer()
+            self.connection.close()
+
+    def get_runs(self):
+        '''Return a list of tuples of the id, start time, checkpoint, 
+        ground truth, detection mode and number of scored images of 
+        every run.'''
+        return self.connection.execute(
+                    'SELECT runs.id, runs.started, runs.checkpoint, '
+                    'runs.ground_truth, runs.detection_mode, '
+                    'COUNT(DISTINCT scores.image_id) FROM runs '
+                    'LEFT JOIN scores ON scores.run_id = runs.id '
+                    'GROUP BY runs.id ORDER BY runs.id'
+                ).fetchall()
+
+    def get_latest_run(self):
+        '''Return the id of the latest run, or None if there are no
+        runs.'''
+        return self.connection.execute('SELECT MAX(id) FROM runs').fetchone()[0]
+
+    def get_summary(self, run_id):
+        '''Return a tuple of the maps of the final precision, recall,
+        accuracy and F1 scores of each tool in the run, and a map of the
+        number of failed tasks of each tool. The scores match the
+        scores displayed at the end of the run.
+
+        Parameters:
+        run_id: The id of the run.
+        '''
+        p_score_map, r_score_map, acc_score_map, f1_score_map = (
+                    {}, {}, {}, {}
+                )
+        tools = self.connection.execute(
+                    'SELECT id, name FROM tools ORDER BY id'
+                ).fetchall()
+
+        for tool_id, name in tools:
+            row = self.connection.execute(
+                        'SELECT running_precision, running_recall, '
+                        'running_accuracy, running_f1 FROM scores '
+                        'WHERE run_id = ? AND tool_id = ? '
+                        'ORDER BY position DESC LIMIT 1',
+                        (run_id, tool_id),
+                    ).fetchone()
+            (p_score_map[name], r_score_map[name], acc_score_map[name],
+             f1_score_map[name]) = row or (0, 0, 0, 0)
+
+        failures = dict(self.connection.execute(
+                    'SELECT tools.name, COUNT(*) FROM failures '
+                    'JOIN tools ON tools.id = failures.tool_id '
+                    'WHERE failures.run_id = ? GROUP BY tools.name',
+                    (run_id,),
+                ).fetchall())
+
+        return (p_score_map, r_score_map, acc_score_map, f1_score_map,
+                failures)
+
+    def __add_run_columns(self):
+        '''Add the columns of RUN_COLUMNS missing from the runs table of
+        a database created by an older version.'''
+        columns = {row[1] for row in 
+                   self.connection.execute('PRAGMA table_info(runs)')}
+        for column, definition in RUN_COLUMNS.items():
+            if column not in columns:
+                self.connection.execute(
+                            f'ALTER TABLE runs ADD COLUMN {column} '
+                            f'{definition}'
+                        )
+
+    def __add_row(self, row):
+        '''Buffer a row, inserting the buffer once it is full.
+
+        Parameters:
+        row: A tuple of the kind of row and its values.
+        '''
+        with self.lock:
+            self.buffer.append(row)
+            if len(self.buffer) >= self.flush_size:
+                self.__insert_buffer()
+
+    def __insert_buffer(self):
+        '''Insert the buffered rows in one transaction. The lock must be
+        held by the caller.'''
+        if not self.buffer:
+            return
+
+        with self.connection:
+            scores = []
+            failures = []
+            for kind, image_id, tool_name, *values in self.buffer:
+                ids = (self.run_id, self.__get_id('images', 'image_id',
+                       image_id), self.__get_id('tools', 'name', tool_name))
+                if kind == 'score':
+                    scores.append(ids + tuple(values))
+                else:
+                    failures.append(ids + tuple(values))
+
+            self.connection.executemany(
+                        'INSERT OR REPLACE INTO scores VALUES '
+                        '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        scores,
+                    )
+            self.connection.executemany(
+                        'INSERT INTO failures VALUES (?, ?, ?, ?, ?)',
+                        failures,
+                    )
+        self.buffer.clear()
+
+    def __get_id(self, table, column, value):
+        '''Return the id of a row of the images or tools table, adding
+        the row if it does not exist.
+
+        Parameters:
+        table: The name of the table.
+        column: The name of the unique column.
+        value: The value of the unique column.
+        '''
+        key = (table, value)
+        if key not in self.ids:
+            self.connection.execute(
+                        f'INSERT OR IGNORE INTO {table} ({column}) VALUES (?)',
+                        (value,),
+                    )
+            self.ids[key] = self.connection.execute(
+                        f'SELECT id FROM {table} WHERE {column} = ?',
+                        (value,),
+                    ).fetchone()[0]
+        return self.ids[key]
@@ -0,0 +1,64 @@
+'''
+    The ErrorLog class records the (image, tool) tasks that failed or
+    timed out during a run, and counts the failures of each tool.
+
+    The log is a JSON Lines file, holding one line per failed task with
+    the image, the tool, the type of failure, the message and the
+    traceback. The file is only created when the first failure occurs.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import os
+import json
+from datetime import datetime
+from doc_writer.file import RESULTS_PATH
+
+class ErrorLog:
+    def __init__(self, results_path=RESULTS_PATH, log_path=None):
+        '''Construct an ErrorLog object.
+
+        Parameters:
+        results_path: The directory where the log is saved. Default is
+                      RESULTS_PATH.
+        log_path: The path to the log file. Default is None, which saves
+                  a timestamped log in the results directory.
+        '''
+        if log_path is None:
+            timestamp = datetime.now().strftime('%d-%m-%Y-%H-%M-%S')
+            log_path = os.path.join(results_path, f'errors-{timestamp}.jsonl')
+
+        self.log_path = log_path
+        self.failures = {}
+
+    def record(self, image_path, tool_name, error):
+        '''Add a failed task to the log.
+
+        Parameters:
+        image_path: The directory path to the image.
+        tool_name: The name of the XAI tool.
+        error: A map describing the error, holding its type, message and
+               traceback.
+        '''
+        self.failures[tool_name] = self.failures.get(tool_name, 0) + 1
+
+        line = {
+                'time': datetime.now().isoformat(),
+                'image': image_path,
+                'tool': tool_name,
+                **error,
+            }
+
+        directory = os.path.dirname(self.log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.log_path, 'a') as file:
+            file.write(json.dumps(line) + '\n')
+
+    def get_failures(self, tool_name):
+        '''Return the number of failed tasks of the tool.
+
+        Parameters:
+        tool_name: The name of the XAI tool.
+        '''
+        return self.failures.get(tool_name, 0)
@@ -0,0 +1,306 @@
+'''
+    The ParallelRunner class analyses images in worker processes.
+
+    Each worker builds its own experiment, loading the model checkpoint
+    once, and runs the tasks sent to it one at a time. Tasks are
+    isolated: an exception is returned as the outcome of the task, and a
+    task that exceeds its time budget, or whose worker exits, has its
+    worker killed and replaced. Outcomes are returned in the order the
+    tasks were given, so they can be merged exactly as the results of a
+    serial run.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import os
+import time
+import traceback
+import multiprocessing
+from multiprocessing.connection import wait
+from collections import deque
+
+# the longest time waited for a message before checking the workers
+POLL_INTERVAL = 1.0
+
+# the experiment built by the initialiser of each worker process
+worker_experiment = None
+
+def init_worker(experiment_class, threads, args, kwargs):
+    '''Build the experiment used by the worker process.
+
+    Parameters:
+    experiment_class: The class of the experiment built by the worker.
+    threads: The number of threads TensorFlow may use in the worker.
+    args: The positional arguments of the experiment.
+    kwargs: The keyword arguments of the experiment.
+    '''
+    global worker_experiment
+
+    # workers share the cores, so each uses only its share of threads
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+
+    worker_experiment = experiment_class(*args, **kwargs)
+
+def run_task(experiment, task):
+    '''Return the outcome of a task, which is a tuple of the result and
+    None, or of None and a map describing the error raised.
+
+    Parameters:
+    experiment: The experiment that runs the task.
+    task: A tuple of the arguments of the analyse_image method of the
+          experiment.
+    '''
+    try:
+        return (experiment.analyse_image(*task), None)
+    except Exception as e:
+        return (None, get_error(
+                    'exception',
+                    f'{type(e).__name__}: {e}',
+                    traceback.format_exc()
+                ))
+
+def get_error(error_type, message, error_traceback=None):
+    '''Return a map describing the error of a task.
+
+    Parameters:
+    error_type: Either 'exception', 'timeout' or 'crash'.
+    message: A message describing the error.
+    error_traceback: The formatted traceback of the exception. Default
+                     is None.
+    '''
+    return {
+            'type': error_type,
+            'message': message,
+            'traceback': error_traceback,
+        }
+
+def run_worker(connection, experiment_class, threads, args, kwargs):
+    '''Run the tasks received from the connection until None is
+    received.
+
+    Parameters:
+    connection: The worker end of the pipe to the parent process.
+    experiment_class: The class of the experiment built by the worker.
+    threads: The number of threads TensorFlow may use in the worker.
+    args: The positional arguments of the experiment.
+    kwargs: The keyword arguments of the experiment.
+    '''
+    init_worker(experiment_class, threads, args, kwargs)
+    connection.send(None)   # the worker is ready
+
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        connection.send(run_task(worker_experiment, task))
+
+class Worker:
+    def __init__(self, context, experiment_class, threads, args, kwargs):
+        '''Construct a Worker object, starting its process.
+
+        Parameters:
+        context: The multiprocessing context used to start the process.
+        experiment_class: The class of the experiment built by the
+                          worker.
+        threads: The number of threads TensorFlow may use in the worker.
+        args: The positional arguments of the experiment.
+        kwargs: The keyword arguments of the experiment.
+        '''
+        self.connection, worker_connection = context.Pipe()
+        self.process = context.Process(
+                    target=run_worker,
+                    args=(worker_connection, experiment_class, threads,
+                          args, kwargs),
+                    daemon=True,
+                )
+        self.process.start()
+        worker_connection.close()
+
+        self.ready = False
+        self.task_index = None
+        self.started = None
+
+    def assign(self, task_index, task):
+        '''Send a task to the worker.
+
+        Parameters:
+        task_index: The index of the task.
+        task: A tuple of the arguments of the analyse_image method.
+        '''
+        self.connection.send(task)
+        self.task_index = task_index
+        self.started = time.monotonic()
+
+    def get_elapsed_time(self):
+        '''Return the seconds since the current task was sent, or 0 if
+        the worker is idle.'''
+        return 0 if self.started is None else time.monotonic() - self.started
+
+    def stop(self, kill=False):
+        '''Stop the worker process.
+
+        Parameters:
+        kill: If True, the process is killed without finishing its
+              task. Default is False.
+        '''
+        if not kill:
+            try:
+                self.connection.send(None)
+            except (OSError, ValueError):
+                kill = True
+
+        if kill or not self.__join():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+    def __join(self):
+        '''Return True if the process exits within the poll interval.'''
+        self.process.join(POLL_INTERVAL)
+        return not self.process.is_alive()
+
+class ParallelRunner:
+    def __init__(self, workers, experiment_class, args=(), kwargs=None,
+            task_timeout=None):
+        '''Construct a ParallelRunner object.
+
+        Parameters:
+        workers: The number of worker processes.
+        experiment_class: The class of the experiment built by each
+                          worker. It must have an analyse_image method.
+        args: The positional arguments of the experiment. Default is an
+              empty tuple.
+        kwargs: The keyword arguments of the experiment. Default is
+                None.
+        task_timeout: The number of seconds a task may run before its
+                      worker is killed. Default is None, which gives
+                      tasks unlimited time.
+        '''
+        self.workers = workers
+        self.experiment_class = experiment_class
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.task_timeout = task_timeout
+        self.threads = max(1, (os.cpu_count() or 1) // workers)
+
+        # TensorFlow is not safe to fork, so workers are spawned
+        self.context = multiprocessing.get_context('spawn')
+
+    def analyse_images(self, tasks):
+        '''Return a generator of the outcome of each task, in the order
+        of the tasks. An outcome is a tuple of the result and None, or
+        of None and a map describing the error.
+
+        Parameters:
+        tasks: A list of tuples of the arguments of the analyse_image
+               method of the experiment.
+
+        Raises:
+        RuntimeError: When a worker process exits before it is ready.
+        '''
+        pending = deque(enumerate(tasks))
+        outcomes = {}
+        next_index = 0
+        workers = [self.__start_worker()
+                   for _ in range(min(self.workers, len(tasks)))]
+
+        try:
+            while next_index < len(tasks):
+                for worker in workers:
+                    if worker.ready and worker.task_index is None and pending:
+                        worker.assign(*pending.popleft())
+
+                ready = wait(
+                            [worker.connection for worker in workers],
+                            self.__get_wait_time(workers)
+                        )
+                for i, worker in enumerate(workers):
+                    workers[i] = self.__check_worker(
+                                worker, worker.connection in ready, outcomes
+                            )
+
+                while next_index in outcomes:
+                    yield outcomes.pop(next_index)
+                    next_index += 1
+        finally:
+            for worker in workers:
+                worker.stop(kill=worker.task_index is not None)
+
+    def __start_worker(self):
+        '''Return a new Worker object.'''
+        return Worker(
+                    self.context, self.experiment_class, self.threads,
+                    self.args, self.kwargs
+                )
+
+    def __get_wait_time(self, workers):
+        '''Return the seconds to wait for a message from the workers
+        before their tasks are checked for timeouts.
+
+        Parameters:
+        workers: The list of Worker objects.
+        '''
+        if self.task_timeout is None:
+            return POLL_INTERVAL
+
+        remaining = [self.task_timeout - worker.get_elapsed_time()
+                     for worker in workers if worker.task_index is not None]
+        return max(0, min(remaining + [POLL_INTERVAL]))
+
+    def __check_worker(self, worker, has_message, outcomes):
+        '''Receive the message of the worker, and return the worker, or
+        a new worker replacing it if it was stopped.
+
+        Parameters:
+        worker: The Worker object.
+        has_message: True if the worker has sent a message.
+        outcomes: A map of task indexes to the outcomes of the tasks.
+
+        Raises:
+        RuntimeError: When the worker process exits before it is ready.
+        '''
+        error = None
+        if has_message:
+            try:
+                message = worker.connection.recv()
+            except (EOFError, OSError):
+                worker.process.join(POLL_INTERVAL)
+                error = get_error(
+                            'crash',
+                            'The worker process exited with code '
+                            f'{worker.process.exitcode}.'
+                        )
+            else:
+                if not worker.ready:
+                    worker.ready = True
+                else:
+                    outcomes[worker.task_index] = message
+                    worker.task_index = None
+                    worker.started = None
+                return worker
+        elif self.task_timeout is not None and worker.task_index is not None \
+                and worker.get_elapsed_time() > self.task_timeout:
+            error = get_error(
+                        'timeout',
+                        f'The task ran for more than {self.task_timeout} '
+                        'seconds.'
+                    )
+        elif not worker.process.is_alive():
+            error = get_error(
+                        'crash',
+                        'The worker process exited with code '
+                        f'{worker.process.exitcode}.'
+                    )
+        else:
+            return worker
+
+        if not worker.ready:
+            worker.stop(kill=True)
+            raise RuntimeError('A worker process exited before it was ready.')
+
+        if worker.task_index is not None:
+            outcomes[worker.task_index] = (None, error)
+        worker.stop(kill=True)
+        return self.__start_worker()
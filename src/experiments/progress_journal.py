@@ -0,0 +1,143 @@
+'''
+    The ProgressJournal class records the results of every (image, tool)
+    pair completed in a run, so an interrupted run can be resumed.
+
+    The journal is a JSON Lines file. The first line identifies the run,
+    and every other line holds the raw tp, tn, fp and fn counts of one
+    tool on one image. Lines are flushed and synced to disk as they are
+    written, and a partially written last line is ignored when the
+    journal is read.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import os
+import json
+from doc_writer.file import RESULTS_PATH
+
+JOURNAL_FILENAME = 'journal.jsonl'
+JOURNAL_PATH = os.path.join(RESULTS_PATH, JOURNAL_FILENAME)
+SCORE_KEYS = ['tp', 'tn', 'fp', 'fn']
+
+class ProgressJournal:
+    def __init__(self, run, journal_path=JOURNAL_PATH, resume=False):
+        '''Construct a ProgressJournal object.
+
+        Parameters:
+        run: A map identifying the run. Resuming a journal written by
+             a different run is refused.
+        journal_path: The path to the journal file. Default is
+                      JOURNAL_PATH.
+        resume: If True, the completed results are read from the
+                journal, and new results are added to it. Otherwise a
+                new journal is started. Default is False.
+
+        Raises:
+        ValueError: When resuming a journal written by a different run.
+        '''
+        self.run = run
+        self.journal_path = journal_path
+        self.completed = {}
+
+        directory = os.path.dirname(journal_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if resume and self.__read_journal():
+            self.file = open(journal_path, 'a')
+        else:
+            self.file = open(journal_path, 'w')
+            self.__write_lines([{'run': run}])
+
+    def get_completed(self, image_path, tool_name):
+        '''Return a tuple of the score map and the SHAP evaluations of a
+        completed (image, tool) pair, or None if it is not completed.
+
+        Parameters:
+        image_path: The directory path to the image.
+        tool_name: The name of the XAI tool.
+        '''
+        return self.completed.get((image_path, tool_name))
+
+    def record(self, image_path, results):
+        '''Add the results of the XAI tools on an image to the journal.
+
+        Parameters:
+        image_path: The directory path to the image.
+        results: A list of tuples of the tool name, the score map and
+                 the SHAP evaluations used, which may be None.
+        '''
+        lines = []
+        for tool_name, score_map, evaluations in results:
+            if (image_path, tool_name) in self.completed:
+                continue
+
+            score_map = {key: int(score_map[key]) for key in SCORE_KEYS}
+            evaluations = list(evaluations) if evaluations else None
+            self.completed[(image_path, tool_name)] = (
+                        score_map, evaluations
+                    )
+            lines.append({
+                    'image': image_path,
+                    'tool': tool_name,
+                    **score_map,
+                    'evaluations': evaluations,
+                })
+
+        self.__write_lines(lines)
+
+    def close(self):
+        '''Close the journal file.'''
+        self.file.close()
+
+    def __write_lines(self, lines):
+        '''Write lines to the journal, and sync them to disk.
+
+        Parameters:
+        lines: A list of maps written as JSON lines.
+        '''
+        if not lines:
+            return
+
+        self.file.write(''.join(json.dumps(line) + '\n' for line in lines))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def __read_journal(self):
+        '''Read the completed results from the journal, and return True
+        if the journal has been started.
+
+        A partially written last line is removed from the file, so the
+        next line written starts on a new line.
+
+        Raises:
+        ValueError: When the journal was written by a different run.
+        '''
+        try:
+            with open(self.journal_path, 'rb') as file:
+                content = file.read()
+        except FileNotFoundError:
+            return False
+
+        lines = content.split(b'\n')
+        if lines[-1]:
+            # the last line was cut off when the run was interrupted
+            with open(self.journal_path, 'r+b') as file:
+                file.truncate(len(content) - len(lines[-1]))
+
+        entries = [json.loads(line) for line in lines[:-1] if line]
+        if not entries:
+            return False
+        if entries[0].get('run') != self.run:
+            raise ValueError(
+                        f'{self.journal_path} was written by a different '
+                        'run and cannot be resumed.'
+                    )
+
+        for entry in entries[1:]:
+            score_map = {key: entry[key] for key in SCORE_KEYS}
+            self.completed[(entry['image'], entry['tool'])] = (
+                        score_map, entry['evaluations']
+                    )
+
+        return True
@@ -5,17 +5,34 @@
 __author__='Dean Whitbread'
 __version__='07-08-2023'
 
+import os
+import json
+import hashlib
+from datetime import datetime
 from tensorflow.keras.models import load_model
 from misc.helpers import (
         is_this_choice,get_shortcut_key_str,
         )
-from misc.wrapper import run as predict, is_tumour
+from misc.prediction_table import PredictionTable
 from misc.image_selector import ImageSelector
+from misc.lazy_dataset import LazyDataset
+from misc.dataset_store import DatasetStore
 from xai.grad_cam_xai_factory import GradCamXaiFactory
 from xai.lime_xai_factory import LimeXaiFactory
 from xai.shap_xai_factory import ShapXaiFactory
-from analyser.image_analyser import ImageAnalyser
+from xai.tools.grad_cam_engine import GradCamEngine
+from xai.tools.shap_xai_tool import BACKGROUND_SIZE
+from analyser.image_analyser import ImageAnalyser, REGION_GROUND_TRUTH
+from analyser.score_aggregator import ScoreAggregator, METRICS
+from analyser.detector.tumor_detector import TumorDetector, DETECTION_MODE
 from doc_writer.csv_writer import CsvWriter
+from doc_writer.file import RESULTS_PATH
+from doc_writer.results_database import ResultsDatabase, format_results
+from experiments.parallel_runner import ParallelRunner, run_task
+from experiments.error_log import ErrorLog
+from experiments.progress_journal import ProgressJournal, JOURNAL_FILENAME
+
+TOOL_NAMES = ['lime', 'shap', 'gradcam']
 
 XAI_CHOICES = [
             get_shortcut_key_str('LIME', 'l'),
@@ -24,17 +41,63 @@ XAI_CHOICES = [
            ]
 
 class XaiExperiment:
-    def __init__(self, exp_data):
+    def __init__(self, exp_data, shap_adaptive=False, workers=1, 
+            paths=None, packed=False, resume=False, task_timeout=None,
+            results_path=RESULTS_PATH, database_path=None, 
+            ground_truth=REGION_GROUND_TRUTH, store_key=None):
         '''Construct a XaiExperiment object.
         
         Parameters:
         exp_data: The ExperimentalData object used for the experiment.
+        shap_adaptive: If True, SHAP raises its evaluation budget in 
+                       steps until the explanation converges. Default is
+                       False.
+        workers: The number of worker processes analysing the dataset 
+                 when all results are run. Default is 1, which analyses
+                 the images in this process.
+        paths: A list of image paths used instead of choosing the images
+               from the dataset. Default is None.
+        packed: If True, the images are read from a DatasetStore shared
+                with other processes, instead of being loaded lazily.
+                Default is False.
+        resume: If True, all results are resumed from the progress
+                journal of an interrupted run. Default is False.
+        task_timeout: The number of seconds each (image, tool) task may
+                      run when all results are run. Tasks run in worker
+                      processes when a timeout is given. Default is 
+                      None, which gives tasks unlimited time.
+        results_path: The directory where the results are saved. Default
+                      is RESULTS_PATH.
+        database_path: The path to a SQLite database the results are 
+                       also saved to. Default is None, which saves the
+                       results to csv files only.
+        ground_truth: Either 'region', which scores the tools against 
+                      the detected tumor region, or 'mask', which scores
+                      them against the BraTS segmentation masks. Default
+                      is REGION_GROUND_TRUTH.
+        store_key: The key of the DatasetStore already packed with the
+                   images, when the dataset is packed. Default is None,
+                   which finds the store by hashing every image.
         '''
+        self.exp_data = exp_data
+        self.resume = resume
+        self.task_timeout = task_timeout
+        self.results_path = results_path
+        self.database_path = database_path
+        self.ground_truth = ground_truth
+        self.failures = {}
+        self.aggregators = {}
+        self.shap_adaptive = shap_adaptive
+        self.workers = workers
         self.model = self.__prepare_model(exp_data.get_model_path())
+        self.predictions = PredictionTable(
+                    self.model, exp_data.get_model_path()
+                )
         self.paths, self.images = self.__prepare_dataset(
-                    exp_data.get_dataset_path()
+                    exp_data.get_dataset_path(), paths, packed, store_key
                 )
         self.paths_index = 0
+        self.heatmaps = {}
     
     def __prepare_model(self, model_path):
         '''Prepare the pretrained model for the experiment.
@@ -46,32 +109,81 @@ class XaiExperiment:
         print('Loading model...')
         return load_model(model_path)
 
-    def __prepare_dataset(self, dataset_path):
-        '''Prepare a list of image paths and a list of images from the
-           dataset.
+    def __prepare_dataset(self, dataset_path, paths=None, packed=False,
+            store_key=None):
+        '''Prepare a list of image paths and a LazyDataset of the images 
+           from the dataset. Images are preprocessed when they are 
+           first used, unless the dataset is packed.
 
         Parameters:
         dataset_path: The directory path to the parent dataset folder.
+        paths: A list of image paths used instead of choosing the images
+               from the dataset. Default is None.
+        packed: If True, return a DatasetStore of the images instead of
+                a LazyDataset. Default is False.
+        store_key: The key of the DatasetStore of the images. Default is
+                   None, which finds the store by hashing every image.
         '''
+        if paths is None:
+            selector = ImageSelector(dataset_path)
 
-        selector = ImageSelector(dataset_path)
+            print('Choosing first image...')
+            paths = selector.get_image_paths()
 
-        print('Choosing first image...')
-        paths = selector.get_image_paths()
-
-        print('Generating dataset images list...')
-        images = selector.get_dataset_images()
+        if packed:
+            images = DatasetStore(paths, key=store_key)
+        else:
+            images = LazyDataset(paths)
 
         return (paths, images)
 
     def get_current_image_path(self):
-        '''Return the directory path of the current image.'''
+        '''Return the directory path of the current image, and prefetch
+        the images that follow it.'''
+        self.images.prefetch(self.paths_index + 1)
         return self.paths[self.paths_index]
 
     def get_model_prediction(self):
         '''Return the model predicition for the input image.'''
         image_path = self.get_current_image_path()
-        return predict(image_path, self.model)
+        if not self.predictions.has_score(image_path):
+            # the Grad-CAM pass also computes the prediction
+            self.predictions.set_score(
+                        image_path, self.__get_gradcam_score(image_path)
+                    )
+            self.predictions.flush()
+        return self.predictions.get_label(image_path)
+
+    def __get_gradcam_heatmap(self, image_path):
+        '''Return the Grad-CAM heatmap of the image.
+
+        Only the heatmap and model output of the most recent image are 
+        kept.
+
+        Parameters:
+        image_path: The directory path to the image.
+        '''
+        if image_path not in self.heatmaps:
+            engine = GradCamEngine.get_engine(self.model)
+            predictions, heatmaps = engine.explain(
+                        self.images.get_model_input(
+                            self.images.get_index(image_path))
+                    )
+            self.heatmaps = {
+                        image_path: (heatmaps[0], float(predictions[0][0]))
+                    }
+
+        return self.heatmaps[image_path][0]
+
+    def __get_gradcam_score(self, image_path):
+        '''Return the model output for the image computed by the forward
+        pass of its Grad-CAM heatmap.
+
+        Parameters:
+        image_path: The directory path to the image.
+        '''
+        self.__get_gradcam_heatmap(image_path)
+        return self.heatmaps[image_path][1]
 
     def run(self, user_cmd=None):
         '''Execute the experiments. 
@@ -85,68 +197,132 @@ class XaiExperiment:
         '''
         if not user_cmd:
             p_score_map, r_score_map, acc_score_map, f1_score_map = self.__get_all_results()
-            self.display_results(p_score_map, r_score_map, acc_score_map, f1_score_map)
+            self.display_results(p_score_map, r_score_map, acc_score_map, f1_score_map, self.failures)
         else:
             image_path = self.get_current_image_path()
 
             if is_this_choice(user_cmd, XAI_CHOICES[0]):
-                xai = LimeXaiFactory(image_path, self.model)
+                xai = LimeXaiFactory(
+                            image_path, 
+                            self.model, 
+                            images=self.images
+                        )
             elif is_this_choice(user_cmd, XAI_CHOICES[1]):
-                xai = ShapXaiFactory(image_path, self.model, self.images)
+                xai = ShapXaiFactory(
+                            image_path, 
+                            self.model, 
+                            self.images,
+                            adaptive=self.shap_adaptive
+                        )
             elif is_this_choice(user_cmd, XAI_CHOICES[2]):
-                xai = GradCamXaiFactory(image_path, self.model)
+                xai = GradCamXaiFactory(
+                            image_path, 
+                            self.model, 
+                            self.__get_gradcam_heatmap(image_path),
+                            images=self.images
+                        )
             else:
                 print('Invalid choice. Heading back to start.')
                 return
 
             xai.get_xai_tool().show()
 
-    def __get_xai_tools(self, image_path):
+    def __get_xai_tools(self, image_path, tool_names=TOOL_NAMES):
         '''Return a list of XaiTool objects for the image.
 
         Parameters:
         image_path: The directory path to the image being explained by 
                     the XAI tool.
+        tool_names: A list of the names of the XAI tools. Default is
+                    TOOL_NAMES.
         '''
         xai = []
-        xai.append(LimeXaiFactory(image_path, self.model))
-        xai.append(ShapXaiFactory(image_path, self.model, self.images))
-        xai.append(GradCamXaiFactory(image_path, self.model))
+        if 'lime' in tool_names:
+            xai.append(LimeXaiFactory(
+                        image_path, 
+                        self.model, 
+                        images=self.images
+                    ))
+        if 'shap' in tool_names:
+            xai.append(ShapXaiFactory(
+                        image_path, 
+                        self.model, 
+                        self.images,
+                        adaptive=self.shap_adaptive
+                    ))
+        if 'gradcam' in tool_names:
+            xai.append(GradCamXaiFactory(
+                        image_path, 
+                        self.model, 
+                        self.__get_gradcam_heatmap(image_path),
+                        images=self.images
+                    ))
         return xai
 
     def __get_tool_scores(self, xai):
-        '''Return the scores for the tool used.
+        '''Return the score map for the tool used, the name of the 
+        tool, and the tool.
 
         Parameters:
         xai: The XaiTool object used to explain the input image.  
         '''
         tool = xai.get_xai_tool()
-        analyser = ImageAnalyser(tool)
-        p_score = analyser.precision_score()
-        r_score = analyser.recall_score()
-        acc_score = analyser.accuracy_score()
-        f1_score = analyser.f1_score()
+        analyser = ImageAnalyser(tool, self.ground_truth)
+        score_map = analyser.get_score_map()
         tool_name = analyser.xai_method
 
-        return (p_score, r_score, acc_score, f1_score, tool_name)
+        return (score_map, tool_name, tool)
 
-    def __get_all_results(self):
-        '''Return the scores for all the XAI tools, across the entire 
-           dataset.
+    def analyse_image(self, image_path, tool_names=TOOL_NAMES):
+        '''Return a list containing the results of each XAI tool for the
+        image. Each result is a tuple of the tool name, the map of tp, 
+        tn, fp and fn, the SHAP evaluations used, which is None for the
+        other tools, and the model output computed by the Grad-CAM pass,
+        which is None for the other tools.
+
+        The model output is returned instead of recorded, so worker 
+        processes never write the prediction table.
+
+        Parameters:
+        image_path: The directory path to the image.
+        tool_names: A list of the names of the XAI tools. Default is
+                    TOOL_NAMES.
+        '''
+        results = []
+        for item in self.__get_xai_tools(image_path, tool_names):
+            score_map, tool_name, tool = self.__get_tool_scores(item)
+
+            evaluations = score = None
+            if tool_name=='gradcam':
+                score = self.__get_gradcam_score(image_path)
+            elif tool_name=='shap':
+                evaluations = (
+                            tool.max_evals,
+                            tool.get_evaluations_used(),
+                            tool.has_converged(),
+                        )
+
+            results.append((tool_name, score_map, evaluations, score))
+
+        return results
+
+    def __select_images(self):
+        '''Return a list of the images analysed when all results are run.
+        Each item is a tuple of the image path, whether the model 
+        predicts a tumour, and the number of dataset images read up to
+        and including the image.
+
+        Equal numbers of tumour and non-tumour images are chosen, in the
+        order of the paths.
         '''
         index=0
         dataset_size = len(self.paths)
         max_tumour=max_non_tumour = dataset_size//4
-        p_score_map = {'lime':0,'shap':0,'gradcam':0} # precision score
-        r_score_map = {'lime':0,'shap':0,'gradcam':0} # recall score
-        acc_score_map = {'lime':0,'shap':0,'gradcam':0} # accuracy score
-        f1_score_map = {'lime':0,'shap':0,'gradcam':0}
-        writer = CsvWriter()
-        
+        selected = []
+
         while (max_tumour or max_non_tumour) and index<dataset_size:
             image_path = self.paths[index]
-            image_id = image_path[image_path.index('Brats'):]
-            tumour_present = is_tumour(image_path, self.model)
+            tumour_present = self.predictions.is_tumour(image_path)
 
             if tumour_present and max_tumour:
                 max_tumour -= 1
@@ -157,47 +333,215 @@ class XaiExperiment:
                 continue
 
             index += 1
-            print(f'Analysing image: {image_id}')
-
-            xai_tools = self.__get_xai_tools(image_path) 
-
-            for item in xai_tools:
-                p_score, r_score, acc_score, f1_score, tool_name = self.__get_tool_scores(item)
-
-                new_p_score = (p_score_map[tool_name] + p_score) / index
-                new_r_score = (r_score_map[tool_name] + r_score) / index
-                new_acc_score = (acc_score_map[tool_name] + acc_score) / index
-                new_f1_score = (f1_score_map[tool_name] + f1_score) / index
-
-                p_score_map[tool_name] = new_p_score
-                r_score_map[tool_name] = new_r_score
-                acc_score_map[tool_name] = new_acc_score
-                f1_score_map[tool_name] = new_f1_score
-
-                if tool_name=='lime':
-                    file = writer.get_lime_csv_file()
-                elif tool_name=='gradcam':
-                    file = writer.get_gradcam_csv_file()
-                elif tool_name=='shap':
-                    file = writer.get_shap_csv_file()
-                else:
-                    file = None
-
-                message =(f'{image_id},{new_acc_score},{new_p_score},{new_r_score},{new_f1_score},{tumour_present}')
-                file.write(message)
-
-            del xai_tools
-
-        return (p_score_map, r_score_map, acc_score_map, f1_score_map)
-
-    def display_results(self, p_score_map, r_score_map, acc_score_map, f1_score_map):
-        '''Return the overall score for the XAI tool.'''
-        output = ""
-        for name in p_score_map.keys():
-            output += (f"{name.title()}:\n"+(" " * 5)
-                    +f"Accuracy Score: {acc_score_map[name]}\n"+(" " * 5)
-                    +f"Precision Score: {p_score_map[name]}\n"+(" " * 5)
-                    +f"Recall Score: {r_score_map[name]}\n"+(" " * 5)
-                    +f"F1 Score: {f1_score_map[name]}\n"
-            )
-        print(output)
+            selected.append((image_path, tumour_present, index))
+
+        return selected
+
+    def __analyse_images(self, tasks):
+        '''Return a generator of the outcome of each task, in the order
+        of the tasks. An outcome is a tuple of the results and None, or
+        of None and a map describing the error raised.
+
+        Parameters:
+        tasks: A list of tuples of the directory path to an image and
+               the names of the XAI tools used to explain it.
+        '''
+        if (self.workers > 1 or self.task_timeout is not None) and tasks:
+            # the workers attach to one packed copy of the dataset and
+            # of the SHAP background, instead of each loading their own
+            print('Packing dataset images...')
+            store = DatasetStore(self.paths)
+            store.get_background(BACKGROUND_SIZE)
+
+            runner = ParallelRunner(
+                        self.workers,
+                        XaiExperiment,
+                        args=(self.exp_data,),
+                        kwargs={
+                            'shap_adaptive': self.shap_adaptive,
+                            'paths': self.paths,
+                            'packed': True,
+                            'store_key': store.key,
+                            'ground_truth': self.ground_truth,
+                        },
+                        task_timeout=self.task_timeout,
+                    )
+            yield from runner.analyse_images(tasks)
+        else:
+            for task in tasks:
+                yield run_task(self, task)
+
+    def __get_run(self):
+        '''Return a map identifying the run, used to check that a 
+        journal is resumed by the same run.'''
+        paths = hashlib.sha1('\n'.join(self.paths).encode()).hexdigest()
+        return {
+                'checkpoint': self.predictions.checkpoint_id,
+                'paths': paths,
+                'shap_adaptive': self.shap_adaptive,
+                'ground_truth': self.ground_truth,
+                'detection_mode': DETECTION_MODE,
+            }
+
+    def __get_all_results(self):
+        '''Return the scores for all the XAI tools, across the entire 
+           dataset.
+
+        Every completed (image, tool) pair is recorded in the progress
+        journal. When the run is resumed, the pairs in the journal are 
+        not analysed again, and their results are read from the journal.
+
+        Each pair is analysed as a separate task. A task that fails or
+        times out is recorded in the error log and left out of the 
+        scores, and the run continues.
+
+        The scores of each image are written to the csv files, and added
+        to a ScoreAggregator for each tool. The scores returned are the
+        mean per-image scores of each tool, and the statistics of each 
+        tool are saved to a JSON file.
+        '''
+        self.aggregators = {name: ScoreAggregator() for name in TOOL_NAMES}
+        writer = CsvWriter(self.results_path)
+
+        print('Classifying dataset images...')
+        self.predictions.predict_all(self.paths)
+        selected = self.__select_images()
+
+        if self.ground_truth == REGION_GROUND_TRUTH:
+            # regions are detected once here, and read from the saved 
+            # index by every tool and worker process
+            print('Indexing tumour regions...')
+            TumorDetector.index_images(
+                        self.images.get_image(self.images.get_index(image_path))
+                        for image_path, _, _ in selected
+                    )
+
+        journal = ProgressJournal(
+                    self.__get_run(),
+                    os.path.join(self.results_path, JOURNAL_FILENAME),
+                    resume=self.resume
+                )
+        error_log = ErrorLog(self.results_path)
+        database = None
+        if self.database_path:
+            database = ResultsDatabase(self.database_path)
+            database.start_run(self.__get_run(), TOOL_NAMES)
+        tasks = []
+        for image_path, _, _ in selected:
+            tasks += [(image_path, [name]) for name in TOOL_NAMES if 
+                      not journal.get_completed(image_path, name)]
+
+        completed = len(selected) - len({image_path for image_path, _ in tasks})
+        if completed:
+            print(f'Resuming: {completed} images completed.')
+
+        try:
+            outcomes = self.__analyse_images(tasks)
+            pending = {}
+            for image_path, tool_names in tasks:
+                pending.setdefault(image_path, []).extend(tool_names)
+
+            # results are merged in the order the images were selected
+            for image_path, tumour_present, index in selected:
+                image_id = image_path[image_path.index('Brats'):]
+
+                if image_path in pending:
+                    image_results = []
+                    for tool_name in pending[image_path]:
+                        results, error = next(outcomes)
+                        if error:
+                            print(f'{tool_name} failed on image {image_id}: '
+                                  f'{error["message"]}')
+                            error_log.record(image_path, tool_name, error)
+                            if database:
+                                database.add_failure(image_id, tool_name, error)
+                        else:
+                            for (name, score_map, evaluations, 
+                                    score) in results:
+                                if score is not None:
+                                    # the Grad-CAM output is the recorded
+                                    # prediction of the image
+                                    self.predictions.set_score(
+                                                image_path, score
+                                            )
+                                image_results.append(
+                                            (name, score_map, evaluations)
+                                        )
+
+                    journal.record(image_path, image_results)
+                    print(f'Analysed image: {image_id}')
+
+                for tool_name in TOOL_NAMES:
+                    if not journal.get_completed(image_path, tool_name):
+                        continue    # the task failed
+
+                    score_map, evaluations = journal.get_completed(image_path, tool_name)
+                    aggregator = self.aggregators[tool_name]
+                    scores = aggregator.add(score_map, tumour_present)
+                    acc_score, p_score, r_score, f1_score = (
+                                scores[metric] for metric in METRICS
+                            )
+
+                    if tool_name=='lime':
+                        file = writer.get_lime_csv_file()
+                    elif tool_name=='gradcam':
+                        file = writer.get_gradcam_csv_file()
+                    elif tool_name=='shap':
+                        file = writer.get_shap_csv_file()
+                    else:
+                        file = None
+
+                    message =(f'{image_id},{acc_score},{p_score},{r_score},{f1_score},{tumour_present}')
+                    file.write(message)
+
+                    if database:
+                        database.add_score(
+                                    image_id, tool_name, index, 
+                                    tumour_present, score_map,
+                                    (acc_score, p_score, r_score, f1_score),
+                                    tuple(aggregator.get_macro(metric) 
+                                          for metric in METRICS)
+                                )
+
+                    if evaluations:
+                        max_evals, evaluations_used, converged = evaluations
+                        writer.get_shap_evaluations_csv_file().write(
+                                    f'{image_id},{max_evals},'
+                                    f'{evaluations_used},{converged}'
+                                )
+        finally:
+            self.predictions.flush()
+            journal.close()
+            writer.close()
+            if database:
+                database.close()
+
+        self.failures = {name: error_log.get_failures(name) 
+                         for name in TOOL_NAMES}
+        self.__save_statistics()
+
+        return tuple(
+                    {name: self.aggregators[name].get_macro(metric) 
+                     for name in TOOL_NAMES}
+                    for metric in ('precision', 'recall', 'accuracy', 'f1')
+                )
+
+    def __save_statistics(self):
+        '''Save the statistics of each XAI tool, for all, tumour and 
+        non-tumour images, to a JSON file in the results directory.'''
+        timestamp = datetime.now().strftime('%d-%m-%Y-%H-%M-%S')
+        path = os.path.join(self.results_path, f'statistics-{timestamp}.json')
+        statistics = {name: aggregator.get_summary() 
+                      for name, aggregator in self.aggregators.items()}
+
+        with open(path, 'w') as file:
+            json.dump(statistics, file, indent=4)
+
+    def display_results(self, p_score_map, r_score_map, acc_score_map, f1_score_map, failures=None):
+        '''Return the overall score for the XAI tool.
+
+        Parameters:
+        failures: A map of the number of failed tasks of each tool. 
+                  Default is None.
+        '''
+        print(format_results(p_score_map, r_score_map, acc_score_map, f1_score_map, failures))
@@ -0,0 +1,40 @@
+'''
+    The index_regions script detects the tumor region of every image in
+    the dataset and saves it to the region index, so experiments and
+    re-scoring read the regions instead of detecting them.
+
+    Images already in the index are skipped. Execute from the src folder
+    using:
+        python index_regions.py --dataset ../dataset/images_used
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import argparse
+import time
+from misc.image_selector import ImageSelector
+from misc.lazy_dataset import LazyDataset
+from analyser.detector.region_index import RegionIndex
+from analyser.detector.tumor_detector import TumorDetector, DETECTOR_PARAMS
+
+DATASET_PATH = '../dataset/images_used'
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dataset', default=DATASET_PATH,
+                        help='path to the folder of dataset images')
+    args = parser.parse_args()
+
+    paths = ImageSelector(args.dataset).get_image_paths()
+    images = LazyDataset(paths)
+    region_index = RegionIndex.get_index(DETECTOR_PARAMS)
+
+    start = time.perf_counter()
+    detected = TumorDetector.index_images(
+                (images.get_image(index) for index in range(len(paths))),
+                region_index
+            )
+    elapsed = time.perf_counter() - start
+
+    print(f'Detected {detected} regions in {elapsed:.1f}s. The index '
+          f'holds {len(region_index)} images: {region_index.path}')
@@ -0,0 +1,47 @@
+'''
+    The ingest_segmentations script adds the BraTS segmentation mask of
+    every dataset image to the mask store, so experiments can score the
+    XAI tools against the real tumor with --ground-truth mask.
+
+    Needs the nibabel package. Execute from the src folder using:
+        python ingest_segmentations.py --dataset ../dataset/images_used
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import os
+import argparse
+import time
+from analyser.mask_store import MaskStore, MASKS_PATH
+from misc.segmentation_loader import (
+        ingest_segmentations, BRATS_PATH, ROTATIONS,
+        )
+
+DATASET_PATH = '../dataset/images_used'
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dataset', default=DATASET_PATH,
+                        help='path to the folder of dataset images')
+    parser.add_argument('--brats', default=BRATS_PATH,
+                        help='path to the BraTS training data holding the '
+                             'HGG and LGG folders')
+    parser.add_argument('--masks', default=MASKS_PATH,
+                        help='path to the mask store file')
+    parser.add_argument('--rotations', type=int, default=ROTATIONS,
+                        help='number of times each segmentation slice is '
+                             'rotated by 90 degrees to match the images')
+    args = parser.parse_args()
+
+    paths = sorted(f'{args.dataset}/{name}'
+                   for name in os.listdir(args.dataset))
+    store = MaskStore(args.masks)
+
+    start = time.perf_counter()
+    missing = ingest_segmentations(paths, store, args.brats, args.rotations)
+    elapsed = time.perf_counter() - start
+
+    for path in missing:
+        print(f'No segmentation found for: {path}')
+    print(f'Ingested {len(paths) - len(missing)} masks in {elapsed:.1f}s. '
+          f'The store holds {len(store)} masks: {args.masks}')
@@ -0,0 +1,273 @@
+'''
+    DatasetStore class packs the preprocessed dataset images into one
+    contiguous uint8 array saved on disk and opened as a memory map.
+
+    The array has shape (N, H, W, 3) and holds one row per distinct
+    image, ordered by the hash of the image file. The store is keyed by
+    the hashes of every image and the preprocessing parameters, so a
+    dataset is only packed once and later runs open the existing file.
+    Images are returned as read-only views of the memory map, and are
+    normalised to float32 only when a batch is requested.
+
+    An index of the row of each image path is saved beside the array,
+    with the modification time and size of each file. A store reopened
+    with its key reads the rows from the index, so the images are only
+    hashed again when their files have changed.
+
+    Processes that open the same store share the pages of the memory
+    map, so worker processes attach to one copy of the dataset. The 
+    normalised background images of the SHAP gradient explainer are
+    saved beside the store and shared in the same way.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from misc import wrapper
+
+STORE_PATH = '../cache/dataset'
+
+class DatasetStore:
+    def __init__(self, paths, store_path=STORE_PATH, key=None):
+        '''Construct a DatasetStore object, packing the images into a
+        new store when no store exists for them.
+
+        Parameters:
+        paths: A list of directory paths to the dataset images. The
+               images are indexed in the order of the list.
+        store_path: The directory where the store files are saved.
+                    Default is STORE_PATH.
+        key: The key of a store already packed with the images. Default
+             is None, which finds the key by hashing every image.
+        '''
+        self.paths = list(paths)
+        self.store_path = store_path
+        self.path_index = {path: i for i, path in enumerate(self.paths)}
+
+        self.key = key
+        self.rows = None if key is None else self.__load_rows(key)
+        if self.rows is None:
+            self.key, self.rows = self.__hash_images()
+
+        self.images = self.__open_store(self.key)
+        if self.images is None and self.paths:
+            self.__create_store(self.key)
+            self.images = self.__open_store(self.key)
+        self.__save_index()
+
+    def __len__(self):
+        '''Return the number of images in the dataset.'''
+        return len(self.paths)
+
+    def get_paths(self):
+        '''Return a list containing the paths to the images.'''
+        return list(self.paths)
+
+    def get_index(self, path):
+        '''Return the index of the image in the dataset.
+
+        Parameters:
+        path: The directory path to the image.
+        '''
+        return self.path_index[path]
+
+    def get_image(self, index):
+        '''Return the cropped uint8 image of shape (H, W, 3). The array
+        is a read-only view of the store.
+
+        Parameters:
+        index: The index of the image in the dataset.
+        '''
+        return self.images[self.rows[index]]
+
+    def get_batch(self, indices):
+        '''Return the images normalised to float32, formatted according
+        to the model's input data format as an array of shape
+        (N, H, W, 3).
+
+        Parameters:
+        indices: A slice or a list of indexes of images in the dataset.
+        '''
+        batch = self.images[self.rows[indices]]
+        return batch.astype(np.float32) / np.float32(255)
+
+    def get_model_input(self, index):
+        '''Return the normalised image formatted according to the
+        model's input data format as an array of shape (1, H, W, 3).
+
+        Parameters:
+        index: The index of the image in the dataset.
+        '''
+        return self.get_batch([index])
+
+    def get_background(self, size):
+        '''Return the first images of the dataset normalised to float32,
+        as a read-only memory map of shape (N, H, W, 3).
+
+        The background is saved the first time it is requested, and
+        every process that requests it shares the same pages.
+
+        Parameters:
+        size: The number of images in the background.
+        '''
+        size = min(size, len(self.paths))
+        sha = hashlib.sha1(self.key.encode())
+        sha.update(self.rows[:size].tobytes())
+        path = os.path.join(
+                    self.store_path, f'{sha.hexdigest()}-background.npy'
+                )
+
+        try:
+            return np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            pass
+
+        os.makedirs(self.store_path, exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as file:
+            np.save(file, self.get_batch(slice(0, size)))
+        os.replace(temp_path, path)
+        return np.load(path, mmap_mode='r')
+
+    def prefetch(self, index):
+        '''Do nothing, as every image in the store is already 
+        preprocessed. The method matches the LazyDataset interface.
+
+        Parameters:
+        index: The index of the first image prefetched.
+        '''
+
+    def __hash_images(self):
+        '''Return a tuple of the key of the store and an array of the
+        row of each image, found by hashing every image.'''
+        hashes = [wrapper.image_cache.get_image_hash(p) for p in self.paths]
+        row_hashes = sorted(set(hashes))
+        row_index = {h: row for row, h in enumerate(row_hashes)}
+        rows = np.array([row_index[h] for h in hashes], dtype=np.int64)
+        return (self.__get_key(row_hashes), rows)
+
+    def __get_key(self, row_hashes):
+        '''Return the key of the store.
+
+        Parameters:
+        row_hashes: A sorted list of the hashes of the distinct images.
+        '''
+        sha = hashlib.sha1(wrapper.image_cache.params.encode())
+        for image_hash in row_hashes:
+            sha.update(image_hash.encode())
+        return sha.hexdigest()
+
+    def __get_store_paths(self, key):
+        '''Return the paths to the image array and the path index files.
+
+        Parameters:
+        key: The key of the store.
+        '''
+        return (
+                os.path.join(self.store_path, f'{key}-images.npy'),
+                os.path.join(self.store_path, f'{key}-index.json'),
+            )
+
+    def __load_rows(self, key):
+        '''Return an array of the row of each image read from the path
+        index of the store, or None if an image is missing from the 
+        index or its file has changed since it was indexed.
+
+        Parameters:
+        key: The key of the store.
+        '''
+        index_path = self.__get_store_paths(key)[1]
+        try:
+            with open(index_path, 'r') as file:
+                index = json.load(file)
+
+            rows = []
+            for path in self.paths:
+                row, mtime_ns, size = index[path]
+                stat = os.stat(path)
+                if (stat.st_mtime_ns, stat.st_size) != (mtime_ns, size):
+                    return None
+                rows.append(row)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return np.array(rows, dtype=np.int64)
+
+    def __save_index(self):
+        '''Save the row, modification time and size of each image path
+        in the path index of the store, keeping the paths indexed by 
+        other datasets of the same images.'''
+        if self.images is None:
+            return
+
+        index_path = self.__get_store_paths(self.key)[1]
+        try:
+            with open(index_path, 'r') as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            index = {}
+
+        changed = False
+        for path, row in zip(self.paths, self.rows):
+            stat = os.stat(path)
+            entry = [int(row), stat.st_mtime_ns, stat.st_size]
+            if index.get(path) != entry:
+                index[path] = entry
+                changed = True
+
+        if changed:
+            suffix = f'{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(f'{index_path}.{suffix}', 'w') as file:
+                json.dump(index, file)
+            os.replace(f'{index_path}.{suffix}', index_path)
+
+    def __open_store(self, key):
+        '''Return the image array opened as a read-only memory map, or
+        None if the store does not exist.
+
+        Parameters:
+        key: The key of the store.
+        '''
+        images_path = self.__get_store_paths(key)[0]
+        try:
+            return np.load(images_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+    def __create_store(self, key):
+        '''Preprocess the images and save them as a new store.
+
+        The store is written under a temporary name and then renamed, so
+        an interrupted run never leaves a partial store behind.
+
+        Parameters:
+        key: The key of the store.
+        '''
+        images_path = self.__get_store_paths(key)[0]
+        first_paths = {}
+        for path, row in zip(self.paths, self.rows):
+            first_paths.setdefault(int(row), path)
+
+        os.makedirs(self.store_path, exist_ok=True)
+        suffix = f'{os.getpid()}.{threading.get_ident()}.tmp'
+
+        images = None
+        for row in range(len(first_paths)):
+            # images are loaded directly, so the per-image cache files
+            # are not written for every image in the dataset
+            image = wrapper.load_image(first_paths[row])
+            if images is None:
+                images = np.lib.format.open_memmap(
+                            f'{images_path}.{suffix}', mode='w+',
+                            dtype=np.uint8,
+                            shape=(len(first_paths),) + image.shape
+                        )
+            images[row] = image
+
+        images.flush()
+        del images
+        os.replace(f'{images_path}.{suffix}', images_path)
@@ -0,0 +1,190 @@
+'''
+    ImageCache class stores preprocessed images so that each image in
+    the dataset is decoded, cropped and resized only once.
+
+    Images are keyed by a hash of the file content and the preprocessing
+    parameters. The cropped image and the normalised model input are
+    held in memory with least recently used (LRU) eviction, and saved
+    to disk as .npy files so later runs skip the preprocessing.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '17-10-2026'
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+CACHE_PATH = '../cache/images'
+MAX_CACHED_IMAGES = 32
+
+def get_file_hash(path):
+    '''Return the SHA-1 hash of the content of a file.
+
+    Parameters:
+    path: The directory path to the file.
+    '''
+    sha = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+class ImageCache:
+    def __init__(self, loader, params, cache_path=CACHE_PATH,
+            max_size=MAX_CACHED_IMAGES):
+        '''Construct an ImageCache object.
+
+        Parameters:
+        loader: A function that returns the cropped uint8 image from a
+                directory path.
+        params: A string describing the preprocessing done by the loader.
+                Changing the preprocessing must change this string.
+        cache_path: The directory where the .npy files are saved. Default
+                    is CACHE_PATH.
+        max_size: The maximum number of images held in memory. Default is
+                  MAX_CACHED_IMAGES.
+        '''
+        self.loader = loader
+        self.params = params
+        self.cache_path = cache_path
+        self.max_size = max_size
+        self.images = OrderedDict()
+        self.hashes = {}
+        self.lock = threading.Lock()
+
+    def get_image_hash(self, path):
+        '''Return the hash of the image file content.
+
+        The hash is remembered until the file is modified.
+
+        Parameters:
+        path: The directory path to the image.
+        '''
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self.lock:
+            if path in self.hashes and self.hashes[path][0] == version:
+                return self.hashes[path][1]
+
+        image_hash = get_file_hash(path)
+        with self.lock:
+            self.hashes[path] = (version, image_hash)
+        return image_hash
+
+    def get_cropped_image(self, path):
+        '''Return the cropped uint8 image. The array is read-only.
+
+        Parameters:
+        path: The directory path to the image.
+        '''
+        return self.__get_entry(path)[0]
+
+    def get_model_input(self, path):
+        '''Return the normalised image formatted according to the
+        model's input data format. The array is read-only.
+
+        Parameters:
+        path: The directory path to the image.
+        '''
+        return self.__get_entry(path)[1]
+
+    def clear(self):
+        '''Remove all images held in memory.'''
+        with self.lock:
+            self.images.clear()
+
+    def __get_entry(self, path):
+        '''Return a tuple containing the cropped image and the model
+        input, loading it from disk or preprocessing it when it is not
+        held in memory.
+
+        Parameters:
+        path: The directory path to the image.
+        '''
+        key = self.__get_key(path)
+
+        with self.lock:
+            if key in self.images:
+                self.images.move_to_end(key)
+                return self.images[key]
+
+        entry = self.__load_entry(key)
+        if entry is None:
+            entry = self.__create_entry(path)
+            self.__save_entry(key, entry)
+
+        for array in entry:
+            array.flags.writeable = False
+
+        with self.lock:
+            self.images[key] = entry
+            self.images.move_to_end(key)
+            while len(self.images) > self.max_size:
+                self.images.popitem(last=False)
+
+        return entry
+
+    def __get_key(self, path):
+        '''Return the cache key of the image.
+
+        Parameters:
+        path: The directory path to the image.
+        '''
+        key = f'{self.get_image_hash(path)}-{self.params}'
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def __get_entry_paths(self, key):
+        '''Return the paths to the .npy files of the cropped image and
+        the model input.
+
+        Parameters:
+        key: The cache key of the image.
+        '''
+        return (
+                os.path.join(self.cache_path, f'{key}-image.npy'),
+                os.path.join(self.cache_path, f'{key}-input.npy'),
+            )
+
+    def __create_entry(self, path):
+        '''Return a tuple containing the cropped image and the model
+        input, preprocessed from the image file.
+
+        Parameters:
+        path: The directory path to the image.
+        '''
+        image = self.loader(path)
+        model_input = np.expand_dims(image / 255.0, axis=0)
+        return (image, model_input)
+
+    def __load_entry(self, key):
+        '''Return the entry saved on disk, or None if it is not saved.
+
+        Parameters:
+        key: The cache key of the image.
+        '''
+        image_path, input_path = self.__get_entry_paths(key)
+        try:
+            return (np.load(image_path), np.load(input_path))
+        except (OSError, ValueError):
+            # missing or partially written files are rebuilt
+            return None
+
+    def __save_entry(self, key, entry):
+        '''Save the entry to disk.
+
+        Files are written under a temporary name and then renamed, so an
+        interrupted run never leaves a partial file behind.
+
+        Parameters:
+        key: The cache key of the image.
+        entry: A tuple containing the cropped image and the model input.
+        '''
+        os.makedirs(self.cache_path, exist_ok=True)
+        for path, array in zip(self.__get_entry_paths(key), entry):
+            temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temp_path, 'wb') as file:
+                np.save(file, array)
+            os.replace(temp_path, path)
@@ -9,7 +9,7 @@ __author__="Dean Whitbread"
 __version__="07-08-2023"
 
 import os
-from misc import wrapper
+from misc.dataset_store import DatasetStore
 import random as rand
 
 IMAGES_PATH = '../../dataset/images_used' 
@@ -42,12 +42,6 @@ class ImageSelector:
         return paths
 
     def get_dataset_images(self):
-        '''Return a list of images formatted according to the model's 
-        input data format.'''
-        images = self.get_image_paths()
-        for i in range(0, len(images)):
-            path = images[i]
-            image = wrapper.prepare_image(path)
-            images[i] = image
-        
-        return images
+        '''Return a DatasetStore of the images, packed into a memory 
+        mapped array the first time the dataset is used.'''
+        return DatasetStore(self.get_image_paths())
@@ -0,0 +1,130 @@
+'''
+    LazyDataset class loads the dataset images on demand, instead of
+    preprocessing the entire dataset before the experiment starts.
+
+    Whenever an image is requested, a background thread prefetches the
+    images that follow it in the order of the paths, so the next image
+    is usually preprocessed before it is needed. Preprocessed images are
+    held by the image cache in the wrapper module.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import queue
+import threading
+import numpy as np
+from misc import wrapper
+
+PREFETCH_SIZE = 4
+
+class LazyDataset:
+    def __init__(self, paths, prefetch_size=PREFETCH_SIZE):
+        '''Construct a LazyDataset object.
+
+        Parameters:
+        paths: A list of directory paths to the dataset images. The
+               images are indexed in the order of the list.
+        prefetch_size: The number of images prefetched after the image
+                       requested. Must be smaller than the number of
+                       images held by the image cache. Default is
+                       PREFETCH_SIZE.
+        '''
+        self.paths = list(paths)
+        self.path_index = {path: i for i, path in enumerate(self.paths)}
+        self.prefetch_size = prefetch_size
+        self.pending = queue.Queue()
+        self.queued = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def __len__(self):
+        '''Return the number of images in the dataset.'''
+        return len(self.paths)
+
+    def get_paths(self):
+        '''Return a list containing the paths to the images.'''
+        return list(self.paths)
+
+    def get_index(self, path):
+        '''Return the index of the image in the dataset.
+
+        Parameters:
+        path: The directory path to the image.
+        '''
+        return self.path_index[path]
+
+    def get_image(self, index):
+        '''Return the cropped uint8 image of shape (H, W, 3). The array
+        is read-only.
+
+        Parameters:
+        index: The index of the image in the dataset.
+        '''
+        self.prefetch(index + 1)
+        return wrapper.image_cache.get_cropped_image(self.paths[index])
+
+    def get_model_input(self, index):
+        '''Return the normalised image formatted according to the
+        model's input data format. The array is read-only.
+
+        Parameters:
+        index: The index of the image in the dataset.
+        '''
+        self.prefetch(index + 1)
+        return wrapper.prepare_image(self.paths[index])
+
+    def get_batch(self, indices):
+        '''Return the images normalised to float32, formatted according
+        to the model's input data format as an array of shape
+        (N, H, W, 3).
+
+        Parameters:
+        indices: A slice or a list of indexes of images in the dataset.
+        '''
+        indices = np.arange(len(self.paths))[indices]
+        batch = np.stack([
+                    wrapper.image_cache.get_cropped_image(self.paths[i])
+                    for i in indices
+                ])
+        return batch.astype(np.float32) / np.float32(255)
+
+    def get_background(self, size):
+        '''Return the first images of the dataset normalised to float32,
+        as an array of shape (N, H, W, 3).
+
+        Parameters:
+        size: The number of images in the background.
+        '''
+        return self.get_batch(slice(0, min(size, len(self.paths))))
+
+    def prefetch(self, index):
+        '''Preprocess the images from the index onwards in a background
+        thread. Images already queued are not queued again.
+
+        Parameters:
+        index: The index of the first image prefetched.
+        '''
+        with self.lock:
+            for path in self.paths[index:index+self.prefetch_size]:
+                if path not in self.queued:
+                    self.queued.add(path)
+                    self.pending.put(path)
+
+            if self.thread is None:
+                self.thread = threading.Thread(
+                            target=self.__prefetch_images, daemon=True
+                        )
+                self.thread.start()
+
+    def __prefetch_images(self):
+        '''Preprocess the queued images until the program exits.'''
+        while True:
+            path = self.pending.get()
+            try:
+                wrapper.prepare_image(path)
+            except Exception:
+                # the error is raised again when the image is requested
+                pass
+            finally:
+                with self.lock:
+                    self.queued.discard(path)
@@ -0,0 +1,181 @@
+'''
+    PredictionTable class stores the model predictions for the images
+    in the dataset.
+
+    Predictions are keyed by a hash of the image file content and the
+    model checkpoint, and saved to disk so the model classifies each
+    image only once across runs. Missing predictions are computed in
+    batches.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '17-10-2026'
+
+import os
+import json
+import hashlib
+import numpy as np
+from misc import wrapper
+from misc.image_cache import get_file_hash
+
+PREDICTIONS_PATH = '../cache/predictions.json'
+BATCH_SIZE = 32
+TUMOUR_THRESHOLD = 0.5
+
+# the number of scores set before the table is saved
+SAVE_INTERVAL = 32
+
+def get_checkpoint_id(model_path):
+    '''Return a hash identifying the content of a model checkpoint.
+
+    The checkpoint may be a single file or a saved model directory.
+
+    Parameters:
+    model_path: The directory path to the saved model.
+    '''
+    if os.path.isfile(model_path):
+        return get_file_hash(model_path)
+
+    sha = hashlib.sha1()
+    for root, dirs, files in sorted(os.walk(model_path)):
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            sha.update(os.path.relpath(path, model_path).encode())
+            sha.update(get_file_hash(path).encode())
+    return sha.hexdigest()
+
+class PredictionTable:
+    def __init__(self, model, model_path, table_path=PREDICTIONS_PATH):
+        '''Construct a PredictionTable object.
+
+        Parameters:
+        model: The classification model used to classify the images.
+        model_path: The directory path to the saved model.
+        table_path: The path to the file where predictions are saved.
+                    Default is PREDICTIONS_PATH.
+        '''
+        self.model = model
+        self.checkpoint_id = get_checkpoint_id(model_path)
+        self.table_path = table_path
+        self.table = self.__load_table()
+        self.unsaved = 0
+
+    def predict_all(self, paths, batch_size=BATCH_SIZE):
+        '''Classify every image that has no saved prediction, using
+        batched inference, and save the table.
+
+        Parameters:
+        paths: A list of directory paths to the images.
+        batch_size: The number of images classified per batch. Default
+                    is BATCH_SIZE.
+        '''
+        missing = [path for path in paths if self.__get_key(path) not in
+                   self.table]
+        missing = list(dict.fromkeys(missing))
+
+        for start in range(0, len(missing), batch_size):
+            batch_paths = missing[start:start+batch_size]
+            batch = np.concatenate(
+                        [wrapper.prepare_image(path) for path in batch_paths]
+                    ).astype(np.float32)
+            predictions = self.model.predict(
+                        batch, batch_size=batch_size, verbose=0
+                    )
+
+            for path, prediction in zip(batch_paths, predictions):
+                self.table[self.__get_key(path)] = float(prediction[0])
+
+        if missing:
+            self.save()
+
+    def has_score(self, path):
+        '''Return if the table has a prediction for the image.
+
+        Parameters:
+        path: The directory path to the image.
+        '''
+        return self.__get_key(path) in self.table
+
+    def get_score(self, path):
+        '''Return the model output for the image.
+
+        The image is classified if the table has no prediction for it.
+
+        Parameters:
+        path: The directory path to the image.
+        '''
+        key = self.__get_key(path)
+        if key not in self.table:
+            self.predict_all([path])
+        return self.table[key]
+
+    def set_score(self, path, score):
+        '''Store a model output computed elsewhere for the image.
+
+        The score replaces any score saved for the image. The table is
+        saved once every SAVE_INTERVAL changed scores, so call flush 
+        when the scores have all been set.
+
+        Parameters:
+        path: The directory path to the image.
+        score: The model output for the image.
+        '''
+        key = self.__get_key(path)
+        score = float(score)
+        if self.table.get(key) == score:
+            return
+
+        self.table[key] = score
+        self.unsaved += 1
+        if self.unsaved >= SAVE_INTERVAL:
+            self.save()
+
+    def flush(self):
+        '''Save the table if scores have been set since it was last 
+        saved.'''
+        if self.unsaved:
+            self.save()
+
+    def is_tumour(self, path):
+        '''Return if the model classifies the image as a tumour.
+
+        Parameters:
+        path: The directory path to the image.
+        '''
+        return self.get_score(path) > TUMOUR_THRESHOLD
+
+    def get_label(self, path):
+        '''Return the model prediction for the image as a string.
+
+        Parameters:
+        path: The directory path to the image.
+        '''
+        return 'Tumour' if self.is_tumour(path) else 'Non-Tumour'
+
+    def save(self):
+        '''Save the table to disk.'''
+        directory = os.path.dirname(self.table_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temp_path = f'{self.table_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(self.table, file)
+        os.replace(temp_path, self.table_path)
+        self.unsaved = 0
+
+    def __get_key(self, path):
+        '''Return the table key of the image.
+
+        Parameters:
+        path: The directory path to the image.
+        '''
+        image_hash = wrapper.image_cache.get_image_hash(path)
+        return f'{self.checkpoint_id}:{image_hash}'
+
+    def __load_table(self):
+        '''Return the table saved on disk, or an empty table.'''
+        try:
+            with open(self.table_path, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
@@ -0,0 +1,157 @@
+'''
+    The segmentation_loader module reads the tumor segmentations of the
+    BraTS 2018 dataset, and adds the segmentation slice of each dataset
+    image to a MaskStore.
+
+    Dataset images are named '<patient>-<slice>.jpg' by the
+    select_jpg_images.sh script, where the slice is the index along the
+    last axis of the volume converted by med2image. The segmentation of
+    a patient is found at '<brats>/<HGG|LGG>/<patient>/<patient>_seg.nii'
+    or '.nii.gz'. Each slice is rotated as med2image rotates the images,
+    then cropped and resized exactly as the image.
+
+    Reading the NIfTI volumes needs the nibabel package, which is only
+    imported when segmentations are loaded.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import os
+import re
+import cv2
+import numpy as np
+import misc.wrapper as wrapper
+from analyser.detector.tumor_detector import TumorDetector
+
+BRATS_PATH = '../dataset/MICCAI_BraTS_2018_Data_Training'
+GRADES = ('HGG', 'LGG')
+
+# the number of times med2image rotates each slice by 90 degrees
+ROTATIONS = 1
+
+IMAGE_NAME_PATTERN = re.compile(r'^(?P<patient>.+)-(?P<slice>\d+)(\.jpg)?$')
+
+def parse_image_name(path):
+    '''Return a tuple of the patient and the slice index of a dataset
+    image.
+
+    Parameters:
+    path: The directory path to the image.
+
+    Raises:
+    ValueError: When the image name does not contain a patient and a
+                slice.
+    '''
+    match = IMAGE_NAME_PATTERN.match(os.path.basename(path))
+    if match is None:
+        raise ValueError(f'Cannot find the patient and slice of {path}.')
+    return (match.group('patient'), int(match.group('slice')))
+
+def find_segmentation(patient, brats_path=BRATS_PATH):
+    '''Return the path to the segmentation volume of a patient, or None
+    if it is not found.
+
+    Parameters:
+    patient: The name of the patient folder.
+    brats_path: The directory path to the BraTS training data. Default
+                is BRATS_PATH.
+    '''
+    for grade in GRADES:
+        for extension in ('.nii.gz', '.nii'):
+            path = os.path.join(
+                        brats_path, grade, patient,
+                        f'{patient}_seg{extension}'
+                    )
+            if os.path.exists(path):
+                return path
+    return None
+
+def load_segmentation(path):
+    '''Return the labels of a segmentation volume as an array.
+
+    Parameters:
+    path: The path to the NIfTI segmentation volume.
+
+    Raises:
+    ImportError: When nibabel is not installed.
+    '''
+    try:
+        import nibabel
+    except ImportError:
+        raise ImportError(
+                'nibabel is needed to read the BraTS segmentations. '
+                'Install it with: pip install nibabel'
+            )
+    return np.asanyarray(nibabel.load(path).dataobj)
+
+def get_slice_mask(volume, slice_index, rotations=ROTATIONS):
+    '''Return the boolean tumor mask of a slice of a segmentation
+    volume, oriented as the converted image.
+
+    Parameters:
+    volume: The labels of the segmentation volume.
+    slice_index: The index of the slice along the last axis.
+    rotations: The number of times the slice is rotated by 90 degrees.
+               Default is ROTATIONS.
+    '''
+    return np.rot90(volume[..., slice_index] > 0, rotations)
+
+def get_image_mask(path, slice_mask):
+    '''Return the tumor mask of a dataset image, cropped and resized
+    exactly as the image.
+
+    Parameters:
+    path: The directory path to the image.
+    slice_mask: The boolean tumor mask of the slice of the image.
+
+    Raises:
+    ValueError: When the slice is not the shape of the image.
+    '''
+    image = cv2.imread(path)
+    if slice_mask.shape != image.shape[:2]:
+        raise ValueError(
+                f'Segmentation slice of shape {slice_mask.shape} does not '
+                f'match image {path} of shape {image.shape[:2]}.'
+            )
+    return wrapper.crop_mask(slice_mask, image)
+
+def ingest_segmentations(paths, mask_store, brats_path=BRATS_PATH,
+        rotations=ROTATIONS):
+    '''Add the tumor mask of each image to the mask store, and save the
+    store. Return a list of the paths of the images without a
+    segmentation.
+
+    Each segmentation volume is read once for all of its images.
+
+    Parameters:
+    paths: A list of directory paths to the dataset images.
+    mask_store: The MaskStore the masks are added to.
+    brats_path: The directory path to the BraTS training data. Default
+                is BRATS_PATH.
+    rotations: The number of times each slice is rotated by 90 degrees.
+               Default is ROTATIONS.
+    '''
+    patients = {}
+    for path in paths:
+        patient, slice_index = parse_image_name(path)
+        patients.setdefault(patient, []).append((path, slice_index))
+
+    missing = []
+    for patient, images in patients.items():
+        segmentation_path = find_segmentation(patient, brats_path)
+        if segmentation_path is None:
+            missing += [path for path, _ in images]
+            continue
+
+        volume = load_segmentation(segmentation_path)
+        for path, slice_index in images:
+            slice_mask = get_slice_mask(volume, slice_index, rotations)
+            key = TumorDetector.get_image_key(wrapper.get_image(path))
+            mask_store.add_mask(
+                        key,
+                        os.path.basename(path),
+                        get_image_mask(path, slice_mask)
+                    )
+
+    mask_store.save()
+    return missing
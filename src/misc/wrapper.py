@@ -2,10 +2,11 @@
 import numpy as np
 import cv2
 import imutils
+from misc.image_cache import ImageCache
 
 __author__ = 'David Kelly'
 
-def crop(image):
+def get_crop_box(image):
     # Convert the image to grayscale, and blur it slightly
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
     gray = cv2.GaussianBlur(gray, (5, 5), 0)
@@ -27,17 +28,44 @@ def crop(image):
     extTop = tuple(c[c[:, :, 1].argmin()][0])
     extBot = tuple(c[c[:, :, 1].argmax()][0])
 
+    # the box (top, bottom, left, right) of the four extreme points
+    return (extTop[1], extBot[1], extLeft[0], extRight[0])
+
+
+def crop(image):
     # crop new image out of the original image using the four extreme points (left, right, top, bottom)
-    return image[extTop[1] : extBot[1], extLeft[0] : extRight[0]]
+    top, bottom, left, right = get_crop_box(image)
+    return image[top : bottom, left : right]
 
 
-def prepare_image(path):
+def crop_mask(mask, image):
+    # crop and resize a mask of the original image exactly as the image,
+    # keeping the mask binary
+    x, y = mask.shape[:2]
+    top, bottom, left, right = get_crop_box(image)
+    mask = mask[top : bottom, left : right].astype(np.uint8)
+    return cv2.resize(mask, dsize=(x, y), interpolation=cv2.INTER_NEAREST) > 0
+
+
+def load_image(path):
     img = cv2.imread(path)
     x, y, depth = img.shape
     img = crop(img)
-    img = cv2.resize(img, dsize=(x, y), interpolation=cv2.INTER_CUBIC)
-    img = img / 255.0
-    return np.expand_dims(img, axis=0)
+    return cv2.resize(img, dsize=(x, y), interpolation=cv2.INTER_CUBIC)
+
+
+# preprocessed images are shared by every caller, so each image is
+# decoded, cropped and resized once. Change the params string whenever
+# load_image changes so old cache files are not reused.
+image_cache = ImageCache(load_image, params='crop-resize-cubic')
+
+
+def get_image(path):
+    return image_cache.get_cropped_image(path).copy()
+
+
+def prepare_image(path):
+    return image_cache.get_model_input(path)
 
 
 def get_prediction(path, model):
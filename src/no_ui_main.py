@@ -7,19 +7,56 @@ __version__ = '07-08-2023'
 
 print('Welcome!\nLoading imports...')
 
+import argparse
+import traceback
 from misc.helpers import get_shortcut_key_str, list_to_str, is_this_choice
 from experiments.experimental_data import ExperimentalData
 from experiments.xai_experiments import XaiExperiment
+from doc_writer.file import RESULTS_PATH
+from analyser.image_analyser import GROUND_TRUTHS, REGION_GROUND_TRUTH
 
 DATASET_PATH = '../dataset/images_used'
 MODEL_PATH = '../models/cnn-parameters-improvement-23-0.91.model'
 
 if __name__=='__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--adaptive-shap', action='store_true',
+                        help='raise the SHAP evaluation budget in steps '
+                             'until the explanation converges')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes analysing the '
+                             'images')
+    parser.add_argument('--resume', action='store_true',
+                        help='resume an interrupted run from its progress '
+                             'journal')
+    parser.add_argument('--task-timeout', type=float, default=None,
+                        help='seconds each (image, tool) task may run '
+                             'before it is stopped')
+    parser.add_argument('--results-dir', default=RESULTS_PATH,
+                        help='directory where the results are saved')
+    parser.add_argument('--results-db', default=None,
+                        help='SQLite database the results are also saved '
+                             'to')
+    parser.add_argument('--ground-truth', choices=GROUND_TRUTHS,
+                        default=REGION_GROUND_TRUTH,
+                        help='score against the detected tumour region, or '
+                             'the ingested BraTS segmentation masks')
+    args = parser.parse_args()
+
     data = ExperimentalData(DATASET_PATH, MODEL_PATH)
-    xai_exp = XaiExperiment(data)
+    xai_exp = XaiExperiment(
+                data, 
+                shap_adaptive=args.adaptive_shap, 
+                workers=args.workers,
+                resume=args.resume,
+                task_timeout=args.task_timeout,
+                results_path=args.results_dir,
+                database_path=args.results_db,
+                ground_truth=args.ground_truth
+            )
     try:
         xai_exp.run()
     except Exception as e:
         with open('runtime_errors.txt', 'a') as report:
-            report.write('\n' + e)
+            report.write('\n' + traceback.format_exc())
     print('Goodbye.')
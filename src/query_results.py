@@ -0,0 +1,44 @@
+'''
+    The query_results script prints the summary of a run saved in a
+    results database, as displayed at the end of the run.
+
+    Execute from the src folder using:
+        python query_results.py --db ../results/results.db --run 3
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import argparse
+from doc_writer.results_database import (
+        ResultsDatabase, DATABASE_PATH, format_results,
+        )
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', default=DATABASE_PATH,
+                        help='path to the results database')
+    parser.add_argument('--run', type=int, default=None,
+                        help='id of the run summarised, the latest run by '
+                             'default')
+    parser.add_argument('--list', action='store_true',
+                        help='list the runs in the database')
+    args = parser.parse_args()
+
+    try:
+        database = ResultsDatabase(args.db, read_only=True)
+    except FileNotFoundError as error:
+        parser.error(str(error))
+    if args.list:
+        print('run'.ljust(6) + 'started'.ljust(28) + 'checkpoint'.ljust(44)
+              + 'truth'.ljust(8) + 'mode'.ljust(9) + 'images')
+        for (run_id, started, checkpoint, ground_truth, detection_mode,
+                images) in database.get_runs():
+            print(f'{run_id:<6}{started:<28}{checkpoint:<44}'
+                  f'{ground_truth:<8}{detection_mode:<9}{images}')
+    else:
+        run_id = args.run or database.get_latest_run()
+        if run_id is None:
+            print('The database has no runs.')
+        else:
+            print(format_results(*database.get_summary(run_id)))
+    database.close()
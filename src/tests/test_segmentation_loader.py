@@ -0,0 +1,114 @@
+'''
+    Tests that the segmentation masks ingested from synthetic BraTS
+    volumes line up with the cropped and resized dataset images.
+
+    Needs the nibabel package. Execute from the src folder using:
+        python -m pytest tests
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import os
+import cv2
+import numpy as np
+import pytest
+import misc.wrapper as wrapper
+from analyser.mask_store import MaskStore, MASKS_PATH
+from analyser.detector.tumor_detector import TumorDetector
+from misc.segmentation_loader import ingest_segmentations, ROTATIONS
+
+nibabel = pytest.importorskip('nibabel')
+
+PATIENT = 'Brats18_TEST_1_1'
+SLICE_INDEX = 3
+NUM_SLICES = 6
+SIZE = 240
+
+def create_slice(tumour_centre):
+    '''Return a synthetic MRI slice and its tumour mask, as oriented in
+    the dataset image.
+
+    The brain is an off-centre grey ellipse, so the image is cropped
+    before it is resized, and the tumour is a white disc inside it.
+
+    Parameters:
+    tumour_centre: A tuple of the x and y of the centre of the tumour.
+    '''
+    image = np.zeros((SIZE, SIZE, 3), dtype=np.uint8)
+    cv2.ellipse(image, (110, 130), (70, 90), 0, 0, 360, (90, 90, 90), -1)
+    cv2.circle(image, tumour_centre, 20, (255, 255, 255), -1)
+
+    mask = np.zeros((SIZE, SIZE), dtype=np.uint8)
+    cv2.circle(mask, tumour_centre, 20, 1, -1)
+    return (image, mask.astype(bool))
+
+def write_segmentation(brats_path, slice_masks):
+    '''Write a synthetic segmentation volume of the test patient, with
+    the tumour labels of each slice rotated back as med2image reads
+    them.
+
+    Parameters:
+    brats_path: The directory path to the synthetic BraTS data.
+    slice_masks: A map of slice indexes to the tumour mask of the slice,
+                 as oriented in the dataset image.
+    '''
+    volume = np.zeros((SIZE, SIZE, NUM_SLICES), dtype=np.uint8)
+    for slice_index, mask in slice_masks.items():
+        # label 4 is the enhancing tumour of the BraTS segmentations
+        volume[..., slice_index] = np.rot90(mask, -ROTATIONS) * 4
+
+    patient_path = os.path.join(brats_path, 'HGG', PATIENT)
+    os.makedirs(patient_path)
+    nibabel.save(
+                nibabel.Nifti1Image(volume, np.eye(4)),
+                os.path.join(patient_path, f'{PATIENT}_seg.nii.gz')
+            )
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    '''Return the dataset and BraTS directories of a temporary workspace,
+    running from a src folder inside it so caches stay in the workspace.
+    '''
+    src_path = tmp_path / 'src'
+    dataset_path = tmp_path / 'images_used'
+    brats_path = tmp_path / 'brats'
+    for path in (src_path, dataset_path, brats_path):
+        path.mkdir()
+    monkeypatch.chdir(src_path)
+    return (str(dataset_path), str(brats_path))
+
+def test_ingested_mask_aligns_with_image(workspace):
+    dataset_path, brats_path = workspace
+    image, mask = create_slice((130, 110))
+    image_path = os.path.join(dataset_path, f'{PATIENT}-{SLICE_INDEX}.jpg')
+    cv2.imwrite(image_path, image)
+    write_segmentation(brats_path, {SLICE_INDEX: mask})
+
+    store = MaskStore(MASKS_PATH)
+    missing = ingest_segmentations([image_path], store, brats_path)
+
+    assert missing == []
+    cropped_image = wrapper.get_image(image_path)
+    stored_mask = MaskStore(MASKS_PATH).get_mask(
+                TumorDetector.get_image_key(cropped_image)
+            )
+    assert stored_mask.shape == cropped_image.shape[:2]
+
+    # the tumour is the only white region of the cropped image
+    white = cropped_image.min(axis=2) > 200
+    overlap = (stored_mask & white).sum() / (stored_mask | white).sum()
+    assert overlap > 0.9
+
+def test_missing_segmentation_is_reported(workspace):
+    dataset_path, brats_path = workspace
+    image, _ = create_slice((130, 110))
+    image_path = os.path.join(
+                dataset_path, f'Brats18_NONE_1_1-{SLICE_INDEX}.jpg'
+            )
+    cv2.imwrite(image_path, image)
+
+    store = MaskStore(MASKS_PATH)
+    missing = ingest_segmentations([image_path], store, brats_path)
+
+    assert missing == [image_path]
+    assert len(store) == 0
@@ -0,0 +1,39 @@
+'''
+    Tests that the ShapImageRenderer renders the SHAP values returned by
+    each explainer as one RGBA image.
+
+    Execute from the src folder using:
+        python -m pytest tests
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import numpy as np
+import pytest
+from xai.tools.shap_image_renderer import ShapImageRenderer
+
+HEIGHT, WIDTH, CHANNELS = 8, 6, 3
+
+@pytest.fixture
+def values():
+    '''Return random SHAP values of one image, of shape (1, H, W, C).'''
+    return np.random.default_rng(0).standard_normal(
+                (1, HEIGHT, WIDTH, CHANNELS)
+            )
+
+def test_renders_gradient_ranked_output(values):
+    # GradientExplainer.shap_values(..., ranked_outputs=1) returns the 
+    # ranked output as the last axis of one array
+    image = ShapImageRenderer.render(values[..., None])
+
+    assert image.shape == (HEIGHT, WIDTH, 4)
+    assert image.dtype == np.uint8
+    np.testing.assert_array_equal(image, ShapImageRenderer.render([values]))
+
+def test_renders_last_of_several_outputs(values):
+    outputs = np.stack([np.zeros_like(values), values], -1)
+
+    image = ShapImageRenderer.render(outputs)
+
+    assert image.shape == (HEIGHT, WIDTH, 4)
+    assert image[..., 3].any()
@@ -10,14 +10,20 @@ from xai.tools.grad_cam_xai_tool import GradCamXaiTool
 
 class GradCamXaiFactory(XaiFactory):
 
-    def __init__(self, impath, model):
+    def __init__(self, impath, model, heatmap=None, images=None):
         '''Construct the GradCamXaiFactory abstract class.
 
         Parameters:
         impath: The directory path to the target image.
         model: The classifcation model used to classify the target image.
+        heatmap: The Grad-CAM heatmap of the target image, when it has 
+                 already been computed. Default is None.
+        images: The DatasetStore or LazyDataset holding the target 
+                image. Default is None, which loads the image through
+                the image cache.
         '''
-        super().__init__(impath, model)
+        super().__init__(impath, model, images)
+        self.heatmap = heatmap
 
     def get_xai_tool(self):
         '''Return the explainable AI (XAI) tool used by the class.'''
@@ -25,4 +31,5 @@ class GradCamXaiFactory(XaiFactory):
                     self.get_image_path(), 
                     self.get_target_image(), 
                     self.get_model(),
+                    heatmap=self.heatmap,
                 )
@@ -6,22 +6,39 @@ __author__ = 'Dean Whitbread'
 __version__ = '05-07-2023'
 
 from xai.xai_factory import XaiFactory
-from xai.tools.lime_xai_tool import LimeXaiTool
+from xai.tools.lime_xai_tool import LimeXaiTool, NUM_SAMPLES, BATCH_SIZE
 
 class LimeXaiFactory(XaiFactory):
 
-    def __init__(self, impath, model):
+    def __init__(self, impath, model, num_samples=NUM_SAMPLES, 
+            batch_size=BATCH_SIZE, segmenter=None, images=None):
         '''Construct the LimeXaiFactory class.
 
         Parameters:
         impath: The directory path to the target image.
         model: The classifcation model used to classify the target image.
+        num_samples: The number of perturbed images LIME classifies. 
+                     Default is NUM_SAMPLES.
+        batch_size: The number of perturbed images classified per model
+                    call. Default is BATCH_SIZE.
+        segmenter: The Segmenter object used to split the image into 
+                   superpixels. Default is None, which uses the LIME 
+                   default quickshift segmentation.
+        images: The DatasetStore or LazyDataset holding the target 
+                image. Default is None, which loads the image through
+                the image cache.
         '''
-        super().__init__(impath, model)
+        super().__init__(impath, model, images)
+        self.num_samples = num_samples
+        self.batch_size = batch_size
+        self.segmenter = segmenter
 
     def get_xai_tool(self):
         '''Return the explainable AI (XAI) tool used by the class.'''
         return LimeXaiTool(
                     self.get_target_image(), 
                     self.get_model(),
+                    num_samples=self.num_samples,
+                    batch_size=self.batch_size,
+                    segmenter=self.segmenter,
                 )
@@ -6,27 +6,53 @@ __author__ = 'Dean Whitbread'
 __version__ = '05-07-2023'
 
 from xai.xai_factory import XaiFactory
-from xai.tools.shap_xai_tool import ShapXaiTool
-import misc.wrapper as wrapper
+from xai.tools.shap_xai_tool import (
+        ShapXaiTool, MAX_EVALS, BATCH_SIZE, SHAP_MODES, ADAPTIVE_TOLERANCE,
+        )
 
 class ShapXaiFactory(XaiFactory):
 
-    def __init__(self, impath, model, images):
+    def __init__(self, impath, model, images, max_evals=MAX_EVALS,
+            batch_size=BATCH_SIZE, mode=SHAP_MODES[0], adaptive=False,
+            tolerance=ADAPTIVE_TOLERANCE):
         '''Construct the ShapXaiFactory abstract class.
 
         Parameters:
         impath: The directory path to the target image.
         model: The classifcation model used to classify the target image.
-        images: A list of images converted to nparray format.
+        images: The DatasetStore or LazyDataset of the dataset images,
+                which holds the target image.
+        max_evals: The maximum number of masked images evaluated by the
+                   model. Default is MAX_EVALS.
+        batch_size: The number of masked images evaluated per model 
+                    call. Default is BATCH_SIZE.
+        mode: The SHAP explainer used, either 'partition' or 'gradient'.
+              Default is 'partition'.
+        adaptive: If True, the evaluation budget is raised in steps up to
+                  max_evals until the explanation converges. Default is
+                  False.
+        tolerance: The fraction of changed pixels below which the
+                   explanation has converged. Default is 
+                   ADAPTIVE_TOLERANCE.
         '''
-        super().__init__(impath, model)
-        self.images = images
-        self.images.append(wrapper.prepare_image(impath))
+        super().__init__(impath, model, images)
+        self.max_evals = max_evals
+        self.batch_size = batch_size
+        self.mode = mode
+        self.adaptive = adaptive
+        self.tolerance = tolerance
+        self.model_input = self.get_model_input()
 
     def get_xai_tool(self):
         '''Return the explainable AI (XAI) tool used by the class.'''
         return ShapXaiTool(
                     self.get_target_image(),
                     self.get_model(), 
-                    self.images
+                    self.model_input,
+                    self.images,
+                    max_evals=self.max_evals,
+                    batch_size=self.batch_size,
+                    mode=self.mode,
+                    adaptive=self.adaptive,
+                    tolerance=self.tolerance,
                 )
@@ -0,0 +1,180 @@
+'''
+    The GradCamEngine class computes Grad-CAM heatmaps for batches of
+    images.
+
+    The gradient model is built and compiled once per model and target
+    layer, and reused for every image explained with that model.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '17-10-2026'
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import Model
+import cv2
+
+BATCH_SIZE = 32
+
+def find_target_layer(model):
+    '''Return the name of the final convolutional layer in the model.
+
+    Parameters:
+    model: The classifcation model used to classify the target image.
+    '''
+    for layer in reversed(model.layers):
+        # check layer has a 4D output
+        if len(layer.output_shape) == 4:
+            return layer.name
+
+    raise ValueError("Could not find 4D layer. Cannot apply Grad-CAM.")
+
+class GradCamEngine:
+    # engines already built, keyed by model and target layer
+    engines = {}
+
+    @staticmethod
+    def get_engine(model, target_layer=None):
+        '''Return the GradCamEngine for the model and target layer,
+        building it the first time it is requested.
+
+        Parameters:
+        model: The classifcation model used to classify the images.
+        target_layer: The name of the layer used to compute the heatmaps.
+                      Default is None, which uses the final convolutional
+                      layer.
+        '''
+        key = (id(model), target_layer)
+        if key not in GradCamEngine.engines:
+            engine = GradCamEngine(model, target_layer)
+            GradCamEngine.engines[key] = engine
+
+            # the same engine is used when the layer is named explicitly
+            layer_key = (id(model), engine.get_target_layer())
+            GradCamEngine.engines.setdefault(layer_key, engine)
+
+        return GradCamEngine.engines[key]
+
+    def __init__(self, model, target_layer=None):
+        '''Construct a GradCamEngine object.
+
+        Use get_engine to share the engine between images.
+
+        Parameters:
+        model: The classifcation model used to classify the images.
+        target_layer: The name of the layer used to compute the heatmaps.
+                      Default is None, which uses the final convolutional
+                      layer.
+        '''
+        self.model = model
+        self.target_layer = target_layer or find_target_layer(model)
+        self.grad_model = Model(
+                inputs=[model.inputs],
+                outputs=[
+                        model.get_layer(self.target_layer).output,
+                        model.output
+                    ]
+            )
+        self.compute_gradients = tf.function(
+                self.__compute_gradients, reduce_retracing=True
+            )
+
+    def get_target_layer(self):
+        '''Return the name of the layer used to compute the heatmaps.'''
+        return self.target_layer
+
+    def get_heatmaps(self, images, batch_size=BATCH_SIZE):
+        '''Return an array of shape (N, H, W) containing the uint8
+        heatmap of each image.
+
+        Parameters:
+        images: An array of shape (N, H, W, C) of images formatted
+                according to the model's input data format.
+        batch_size: The number of images explained per taped pass.
+                    Default is BATCH_SIZE.
+        '''
+        return self.explain(images, batch_size)[1]
+
+    def explain(self, images, batch_size=BATCH_SIZE):
+        '''Return a tuple containing the model predictions and the 
+        heatmaps of the images, both computed from one forward pass.
+
+        The tuple is in the order: (predictions, heatmaps). Predictions
+        have the shape of the model output and heatmaps have the shape
+        (N, H, W).
+
+        Parameters:
+        images: An array of shape (N, H, W, C) of images formatted
+                according to the model's input data format.
+        batch_size: The number of images explained per taped pass.
+                    Default is BATCH_SIZE.
+        '''
+        predictions = []
+        heatmaps = []
+        for start in range(0, len(images), batch_size):
+            batch = images[start:start+batch_size]
+            conv_outputs, grads, batch_predictions = self.compute_gradients(
+                        tf.cast(batch, tf.float32)
+                    )
+            predictions.append(batch_predictions.numpy())
+            heatmaps.append(self.__create_heatmaps(
+                        conv_outputs, grads, batch.shape[1:3]
+                    ))
+
+        return (np.concatenate(predictions), np.concatenate(heatmaps))
+
+    def __compute_gradients(self, inputs):
+        '''Return a tuple containing the outputs of the target layer,
+        the gradients of the predicted class score with respect to those
+        outputs, and the model predictions.
+
+        Parameters:
+        inputs: A float32 tensor of shape (N, H, W, C).
+        '''
+        # record operations for automatic differentiation
+        with tf.GradientTape() as tape:
+            (conv_outputs, predictions) = self.grad_model(inputs)
+
+            # score of the highest scoring class of each image
+            class_index = tf.argmax(predictions, axis=1)
+            loss = tf.gather(predictions, class_index, axis=1, batch_dims=1)
+
+        # use automatic differentiation to compute the gradients
+        grads = tape.gradient(loss, conv_outputs)
+
+        return (conv_outputs, grads, predictions)
+
+    def __create_heatmaps(self, conv_outputs, grads, image_shape):
+        '''Return an array of shape (N, H, W) containing the uint8
+        heatmap of each image.
+
+        Parameters:
+        conv_outputs: The outputs of the target layer.
+        grads: The gradients of the class score with respect to the
+               outputs of the target layer.
+        image_shape: The (height, width) of the input images.
+        '''
+        # compute the guided gradients
+        cast_conv_outputs = tf.cast(conv_outputs > 0, "float32")
+        cast_grads = tf.cast(grads > 0, "float32")
+        guided_grads = cast_conv_outputs * cast_grads * grads
+
+        # compute the average of the gradient values of each image
+        weights = tf.reduce_mean(guided_grads, axis=(1, 2))
+        cams = tf.reduce_sum(
+                tf.multiply(weights[:, None, None, :], conv_outputs),
+                axis=-1
+            ).numpy()
+
+        (h, w) = image_shape
+        heatmaps = np.empty((len(cams), h, w), dtype="uint8")
+        for i, cam in enumerate(cams):
+            # grab the spatial dimensions of the input image and resize
+            heatmap = cv2.resize(cam, (w, h))
+
+            # normalize the heatmap such that all values lie in [0, 1]
+            numer = heatmap - np.min(heatmap)
+            denom = (heatmap.max() - heatmap.min()) + 1e-8 # eps
+            heatmap = numer / denom
+            heatmaps[i] = (heatmap * 255).astype("uint8")
+
+        return heatmaps
@@ -0,0 +1,192 @@
+'''
+    The LimeClassifier class adapts the classification model for use
+    with LIME.
+
+    Perturbed images are classified in large batches by an inference
+    function compiled for a fixed batch shape. Predictions are memoized
+    by the perturbation mask within an explanation, so repeated on/off
+    patterns of superpixels are only evaluated once.
+
+    The MemoizingLimeImageExplainer passes the perturbation masks to
+    the LimeClassifier instead of classifying every perturbed image.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '17-10-2026'
+
+import numpy as np
+import tensorflow as tf
+from lime.lime_image import LimeImageExplainer
+
+BATCH_SIZE = 100
+
+class LimeClassifier:
+    # classifiers already built, keyed by model and batch size
+    classifiers = {}
+
+    @staticmethod
+    def get_classifier(model, batch_size=BATCH_SIZE):
+        '''Return the LimeClassifier for the model and batch size,
+        building it the first time it is requested.
+
+        Parameters:
+        model: The classifcation model used to classify the images.
+        batch_size: The number of images classified per model call.
+                    Default is BATCH_SIZE.
+        '''
+        key = (id(model), batch_size)
+        if key not in LimeClassifier.classifiers:
+            LimeClassifier.classifiers[key] = LimeClassifier(
+                        model, batch_size
+                    )
+        return LimeClassifier.classifiers[key]
+
+    def __init__(self, model, batch_size=BATCH_SIZE):
+        '''Construct a LimeClassifier object.
+
+        Use get_classifier to share the compiled inference function
+        between explanations.
+
+        Parameters:
+        model: The classifcation model used to classify the images.
+        batch_size: The number of images classified per model call.
+                    Default is BATCH_SIZE.
+        '''
+        self.model = model
+        self.batch_size = batch_size
+        self.predict_functions = {}
+        self.reset()
+
+    def __call__(self, images):
+        '''Return the model predictions for an array of images.
+
+        Parameters:
+        images: An array of shape (N, H, W, C) of images.
+        '''
+        images = np.asarray(images, dtype=np.float32)
+        predict = self.__get_predict_function(images.shape[1:])
+        predictions = []
+
+        for start in range(0, len(images), self.batch_size):
+            batch = images[start:start+self.batch_size]
+            size = len(batch)
+            if size < self.batch_size:
+                # pad the final batch to keep the compiled input shape
+                padding = np.zeros(
+                            (self.batch_size-size,) + batch.shape[1:],
+                            dtype=np.float32
+                        )
+                batch = np.concatenate([batch, padding])
+
+            predictions.append(predict(batch).numpy()[:size])
+            self.evaluations += size
+
+        return np.concatenate(predictions)
+
+    def predict_masks(self, image, fudged_image, segments, masks):
+        '''Return the model predictions for the perturbations of an
+        image described by superpixel masks.
+
+        Masks that have already been classified during the current
+        explanation are not classified again.
+
+        Parameters:
+        image: The image being explained.
+        fudged_image: The image used to hide superpixels that are off.
+        segments: A 2D array labelling the superpixel of each pixel.
+        masks: An array of shape (num_samples, num_superpixels) where 0
+               marks the superpixels that are hidden.
+        '''
+        keys = [mask.tobytes() for mask in masks]
+        new_masks = {}
+        for key, mask in zip(keys, masks):
+            if key not in self.predictions and key not in new_masks:
+                new_masks[key] = mask
+
+        self.saved_evaluations += len(keys) - len(new_masks)
+
+        new_keys = list(new_masks.keys())
+        for start in range(0, len(new_keys), self.batch_size):
+            batch_keys = new_keys[start:start+self.batch_size]
+            images = []
+            for key in batch_keys:
+                perturbed_image = image.copy()
+                hidden = np.isin(segments, np.where(new_masks[key] == 0)[0])
+                perturbed_image[hidden] = fudged_image[hidden]
+                images.append(perturbed_image)
+
+            for key, prediction in zip(batch_keys, self(np.array(images))):
+                self.predictions[key] = prediction
+
+        return np.array([self.predictions[key] for key in keys])
+
+    def reset(self):
+        '''Forget the predictions and evaluation counts of the previous
+        explanation.'''
+        self.predictions = {}
+        self.evaluations = 0
+        self.saved_evaluations = 0
+
+    def get_evaluations(self):
+        '''Return the number of images classified by the model since the
+        last reset.'''
+        return self.evaluations
+
+    def get_saved_evaluations(self):
+        '''Return the number of model evaluations avoided by memoizing
+        the predictions since the last reset.'''
+        return self.saved_evaluations
+
+    def __get_predict_function(self, image_shape):
+        '''Return the inference function compiled for batches of images
+        with the image shape.
+
+        Parameters:
+        image_shape: The (H, W, C) shape of the images.
+        '''
+        if image_shape not in self.predict_functions:
+            signature = tf.TensorSpec(
+                        (self.batch_size,) + tuple(image_shape), tf.float32
+                    )
+            self.predict_functions[image_shape] = tf.function(
+                        lambda images: self.model(images, training=False),
+                        input_signature=[signature]
+                    )
+        return self.predict_functions[image_shape]
+
+class MemoizingLimeImageExplainer(LimeImageExplainer):
+
+    def data_labels(self, image, fudged_image, segments, classifier_fn,
+            num_samples, batch_size=10):
+        '''Return the perturbation masks and the predictions of the
+        perturbed images.
+
+        The masks are generated in the same way as LimeImageExplainer,
+        so the explanation is unchanged. When classifier_fn is a
+        LimeClassifier the masks are classified with memoization,
+        otherwise the LimeImageExplainer implementation is used.
+
+        Parameters:
+        image: The image being explained.
+        fudged_image: The image used to hide superpixels that are off.
+        segments: A 2D array labelling the superpixel of each pixel.
+        classifier_fn: The function used to classify the images.
+        num_samples: The number of perturbed images to classify.
+        batch_size: The number of images classified per call. Ignored
+                    when classifier_fn is a LimeClassifier.
+        '''
+        if not isinstance(classifier_fn, LimeClassifier):
+            return super().data_labels(
+                        image, fudged_image, segments, classifier_fn,
+                        num_samples, batch_size=batch_size
+                    )
+
+        n_features = np.unique(segments).shape[0]
+        data = self.random_state.randint(
+                    0, 2, num_samples * n_features
+                ).reshape((num_samples, n_features))
+        data[0, :] = 1      # first sample is the original image
+
+        labels = classifier_fn.predict_masks(
+                    image, fudged_image, segments, data
+                )
+        return (data, labels)
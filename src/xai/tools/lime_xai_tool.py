@@ -7,23 +7,43 @@ __author__ = 'Dean Whitbread'
 __version__ = '05-07-2023'
 
 from xai.tools.xai_tool import XaiTool
-from lime.lime_image import LimeImageExplainer
+from xai.tools.lime_classifier import (
+        LimeClassifier, MemoizingLimeImageExplainer, BATCH_SIZE,
+        )
+from xai.tools.segmentation import (
+        Segmenter, segmentation_cache, LIME_RANDOM_STATE,
+        )
 import matplotlib.pyplot as plt
 import numpy as np
 from skimage.segmentation import mark_boundaries
 from analyser.image_analyser import ImageAnalyser
 
+NUM_SAMPLES = 1000
+
 class LimeXaiTool(XaiTool):
 
-    def __init__(self, target_im, model, highlight_im=None):
+    def __init__(self, target_im, model, highlight_im=None, 
+            num_samples=NUM_SAMPLES, batch_size=BATCH_SIZE, segmenter=None):
         '''Constructor for LimeXaiTool class.
 
         Parameters:
         target_im: The target image being classified.
         model: The classifcation model used to classify the target image.
+        num_samples: The number of perturbed images LIME classifies. 
+                     Default is NUM_SAMPLES.
+        batch_size: The number of perturbed images classified per model
+                    call. Default is BATCH_SIZE.
+        segmenter: The Segmenter object used to split the image into 
+                   superpixels. Default is None, which uses the LIME 
+                   default quickshift segmentation.
         '''
-        self.lime = LimeImageExplainer(random_state=3)
+        self.lime = MemoizingLimeImageExplainer(
+                    random_state=LIME_RANDOM_STATE
+                )
         self.target_image = target_im
+        self.num_samples = num_samples
+        self.batch_size = batch_size
+        self.segmenter = segmenter if segmenter is not None else Segmenter()
         
         expl_object = self.get_explaination(model)
         self.set_explained_image(image=None, expl_object=expl_object)
@@ -37,10 +57,28 @@ class LimeXaiTool(XaiTool):
         target_im: The target image being classified.
         model: The classifcation model used to classify the target image.
         '''
-        return self.lime.explain_instance(
+        self.classifier = LimeClassifier.get_classifier(
+                    model, self.batch_size
+                )
+        self.classifier.reset()
+
+        expl_object = self.lime.explain_instance(
                     self.get_target_image(), 
-                    model,
+                    self.classifier,
+                    num_samples=self.num_samples,
+                    batch_size=self.batch_size,
+                    segmentation_fn=segmentation_cache.get_segmentation_fn(
+                        self.segmenter
+                    ),
                 )
+        self.saved_evaluations = self.classifier.get_saved_evaluations()
+
+        return expl_object
+
+    def get_saved_evaluations(self):
+        '''Return the number of model evaluations avoided by memoizing
+        the predictions of the explanation.'''
+        return self.saved_evaluations
 
     def show(self):
         '''Display the XAI tool's explaination.'''
@@ -0,0 +1,199 @@
+'''
+    The Segmenter class splits an image into the superpixels used by
+    LIME, and the SegmentationCache class stores the superpixels so an
+    image is only segmented once per segmenter.
+
+    Segmenters wrap the scikit-image quickshift, SLIC and Felzenszwalb
+    algorithms, or split the image into a fixed grid of square cells.
+    Segments are keyed by a hash of the image and the segmenter
+    parameters, held in memory and saved to disk as .npy files.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '17-10-2026'
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from lime.wrappers.scikit_image import SegmentationAlgorithm
+
+CACHE_PATH = '../cache/segments'
+MAX_CACHED_SEGMENTS = 64
+LIME_RANDOM_STATE = 3
+
+# LimeImageExplainer seeds quickshift with the first number drawn from
+# its random state, so the same seed reproduces its default segments.
+LIME_SEGMENTATION_SEED = np.random.RandomState(
+            LIME_RANDOM_STATE
+        ).randint(0, high=1000)
+
+SEGMENTER_PARAMS = {
+        'quickshift': {
+                'kernel_size': 4,
+                'max_dist': 200,
+                'ratio': 0.2,
+                'random_seed': LIME_SEGMENTATION_SEED,
+            },
+        'slic': {'n_segments': 100, 'compactness': 10, 'start_label': 0},
+        'felzenszwalb': {'scale': 100, 'sigma': 0.5, 'min_size': 50},
+        'grid': {'cell_size': 24},
+    }
+
+class Segmenter:
+    def __init__(self, algo_type='quickshift', **params):
+        '''Construct a Segmenter object.
+
+        Parameters not given use the values in SEGMENTER_PARAMS.
+
+        Parameters:
+        algo_type: The segmentation algorithm. One of 'quickshift',
+                   'slic', 'felzenszwalb' or 'grid'. Default is
+                   'quickshift', which matches the LIME default.
+        params: The parameters of the segmentation algorithm.
+
+        Raises:
+        ValueError: When the segmentation algorithm is unknown.
+        '''
+        if algo_type not in SEGMENTER_PARAMS:
+            raise ValueError(f'Unknown segmentation algorithm: {algo_type}')
+
+        self.algo_type = algo_type
+        self.params = {**SEGMENTER_PARAMS[algo_type], **params}
+
+        if algo_type == 'grid':
+            self.segment = self.__segment_grid
+        else:
+            self.segment = SegmentationAlgorithm(algo_type, **self.params)
+
+    def __call__(self, image):
+        '''Return a 2D array labelling the superpixel of each pixel.
+
+        Parameters:
+        image: The image to segment.
+        '''
+        return self.segment(image)
+
+    def get_key(self):
+        '''Return a string identifying the algorithm and parameters.'''
+        params = ','.join(
+                    f'{name}={value}' for name, value in
+                    sorted(self.params.items())
+                )
+        return f'{self.algo_type}({params})'
+
+    def __segment_grid(self, image):
+        '''Return a 2D array labelling square cells of the image.
+
+        Parameters:
+        image: The image to segment.
+        '''
+        cell_size = self.params['cell_size']
+        (h, w) = image.shape[:2]
+        rows = np.arange(h) // cell_size
+        columns = np.arange(w) // cell_size
+        n_columns = (w + cell_size - 1) // cell_size
+        return rows[:, None] * n_columns + columns[None, :]
+
+    def __str__(self):
+        '''Represent the object as a string.'''
+        return self.get_key()
+
+class SegmentationCache:
+    def __init__(self, cache_path=CACHE_PATH, max_size=MAX_CACHED_SEGMENTS):
+        '''Construct a SegmentationCache object.
+
+        Parameters:
+        cache_path: The directory where the .npy files are saved. Default
+                    is CACHE_PATH. When None, segments are only held in
+                    memory.
+        max_size: The maximum number of segmentations held in memory.
+                  Default is MAX_CACHED_SEGMENTS.
+        '''
+        self.cache_path = cache_path
+        self.max_size = max_size
+        self.segments = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_segments(self, image, segmenter):
+        '''Return the segments of the image, segmenting it only when
+        the segments are not cached.
+
+        Parameters:
+        image: The image to segment.
+        segmenter: The Segmenter object used to segment the image.
+        '''
+        key = self.__get_key(image, segmenter)
+
+        with self.lock:
+            if key in self.segments:
+                self.segments.move_to_end(key)
+                return self.segments[key].copy()
+
+        segments = self.__load_segments(key)
+        if segments is None:
+            segments = segmenter(image)
+            self.__save_segments(key, segments)
+
+        with self.lock:
+            self.segments[key] = segments
+            while len(self.segments) > self.max_size:
+                self.segments.popitem(last=False)
+
+        return segments.copy()
+
+    def get_segmentation_fn(self, segmenter):
+        '''Return a segmentation function for LIME that uses the cache.
+
+        Parameters:
+        segmenter: The Segmenter object used to segment the image.
+        '''
+        return lambda image: self.get_segments(image, segmenter)
+
+    def __get_key(self, image, segmenter):
+        '''Return the cache key of the image and segmenter.
+
+        Parameters:
+        image: The image to segment.
+        segmenter: The Segmenter object used to segment the image.
+        '''
+        image = np.ascontiguousarray(image)
+        sha = hashlib.sha1(image.tobytes())
+        sha.update(f'{image.shape}{image.dtype}'.encode())
+        sha.update(segmenter.get_key().encode())
+        return sha.hexdigest()
+
+    def __load_segments(self, key):
+        '''Return the segments saved on disk, or None if they are not
+        saved.
+
+        Parameters:
+        key: The cache key of the segments.
+        '''
+        if self.cache_path is None:
+            return None
+
+        try:
+            return np.load(os.path.join(self.cache_path, f'{key}.npy'))
+        except (OSError, ValueError):
+            return None
+
+    def __save_segments(self, key, segments):
+        '''Save the segments to disk.
+
+        Parameters:
+        key: The cache key of the segments.
+        segments: The segments of the image.
+        '''
+        if self.cache_path is None:
+            return
+
+        os.makedirs(self.cache_path, exist_ok=True)
+        path = os.path.join(self.cache_path, f'{key}.npy')
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as file:
+            np.save(file, segments)
+        os.replace(temp_path, path)
+
+# segments are shared by every LIME explanation
+segmentation_cache = SegmentationCache()
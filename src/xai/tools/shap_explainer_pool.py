@@ -0,0 +1,143 @@
+'''
+    The ShapExplainerPool class shares one SHAP explainer and masker
+    between every image explained with the same model and image shape.
+
+    The CachedBlurImageMasker class blurs each image once and reuses the
+    blurred background for every masked evaluation of that image.
+
+    Gradient explainers, which attribute the prediction using expected
+    gradients over a background of dataset images, are shared between
+    images in the same way.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '18-10-2026'
+
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import cv2
+import shap
+
+MAX_CACHED_BACKGROUNDS = 16
+
+class CachedBlurImageMasker(shap.maskers.Image):
+    def __init__(self, mask_value, shape=None,
+            max_size=MAX_CACHED_BACKGROUNDS):
+        '''Construct a CachedBlurImageMasker object.
+
+        Parameters:
+        mask_value: The value used to mask hidden regions of the image,
+                    as accepted by shap.maskers.Image.
+        shape: The shape of the images being masked. Default is None.
+        max_size: The maximum number of blurred backgrounds held in
+                  memory. Default is MAX_CACHED_BACKGROUNDS.
+        '''
+        super().__init__(mask_value, shape)
+        self.max_size = max_size
+        self.backgrounds = OrderedDict()
+        self.last_input = None
+        self.last_background = None
+
+    def __call__(self, mask, x):
+        '''Return the image with the hidden regions replaced by the
+        blurred image.
+
+        Parameters:
+        mask: A boolean array marking the visible pixels, or None to
+              hide the entire image.
+        x: The image being masked.
+        '''
+        if self.blur_kernel is None:
+            return super().__call__(mask, x)
+
+        background = self.__get_background(x)
+        in_shape = x.shape
+        x = np.asarray(x).ravel()
+
+        if mask is None:
+            mask = np.zeros(x.size, dtype=bool)
+
+        out = x.copy()
+        out[~mask] = background[~mask]
+        return (out.reshape(1, *in_shape),)
+
+    def __get_background(self, x):
+        '''Return the flattened blurred image.
+
+        The blurred image is looked up by the identity of the image
+        first, and then by a hash of its content.
+
+        Parameters:
+        x: The image being masked.
+        '''
+        if x is self.last_input:
+            return self.last_background
+
+        x_array = np.ascontiguousarray(x)
+        key = hashlib.sha1(x_array.tobytes()).hexdigest()
+        if key in self.backgrounds:
+            self.backgrounds.move_to_end(key)
+        else:
+            self.backgrounds[key] = cv2.blur(
+                        x_array.reshape(self.input_shape), self.blur_kernel
+                    ).ravel()
+            while len(self.backgrounds) > self.max_size:
+                self.backgrounds.popitem(last=False)
+
+        self.last_input = x
+        self.last_background = self.backgrounds[key]
+        return self.last_background
+
+class ShapExplainerPool:
+    # explainers already built, keyed by model and image shape
+    explainers = {}
+    # gradient explainers already built, keyed by model and dataset
+    gradient_explainers = {}
+
+    @staticmethod
+    def get_explainer(model, image_shape):
+        '''Return the SHAP explainer for the model and image shape,
+        building it the first time it is requested.
+
+        Images are masked by blurring hidden regions with a kernel the
+        size of the image.
+
+        Parameters:
+        model: The classifcation model used to classify the images.
+        image_shape: The (H, W, C) shape of the images being explained.
+        '''
+        image_shape = tuple(image_shape)
+        key = (id(model), image_shape)
+        if key not in ShapExplainerPool.explainers:
+            x, y, depth = image_shape
+            masker = CachedBlurImageMasker(f'blur({x},{y})', image_shape)
+            ShapExplainerPool.explainers[key] = shap.Explainer(model, masker)
+        return ShapExplainerPool.explainers[key]
+
+    @staticmethod
+    def get_gradient_explainer(model, images, background_size, batch_size):
+        '''Return the SHAP gradient explainer for the model and dataset,
+        building it the first time it is requested.
+
+        The background is the first images of the dataset, normalised
+        once when the explainer is built. A DatasetStore shares its
+        background between processes.
+
+        Parameters:
+        model: The classifcation model used to classify the images.
+        images: The DatasetStore or LazyDataset of the dataset images.
+        background_size: The number of dataset images in the background.
+        batch_size: The number of samples differentiated per backward 
+                    pass.
+        '''
+        background_size = min(background_size, len(images))
+        key = (id(model), id(images), background_size, batch_size)
+        if key not in ShapExplainerPool.gradient_explainers:
+            data = images.get_background(background_size)
+            explainer = shap.GradientExplainer(
+                        model, data, batch_size=batch_size
+                    )
+
+            # keep the dataset so its id is not reused
+            ShapExplainerPool.gradient_explainers[key] = (explainer, images)
+        return ShapExplainerPool.gradient_explainers[key][0]
@@ -0,0 +1,134 @@
+'''
+    ShapImageRenderer class turns SHAP values into the red and blue
+    explained image drawn by shap.plots.image, without matplotlib.
+
+    The class contains only static methods.
+'''
+__author__ = 'Dean Whitbread'
+__version__ = '17-10-2026'
+
+import numpy as np
+
+# colours of the shap red_transparent_blue colormap
+BLUE_RGB = np.array([30, 136, 229]) / 255
+RED_RGB = np.array([255, 13, 87]) / 255
+COLOURS_PER_SIDE = 100
+COLOUR_TABLE_SIZE = 256
+MAX_VALUE_PERCENTILE = 99.9
+
+class ShapImageRenderer:
+    # the colour table is built the first time an image is rendered
+    __colour_table = None
+
+    @staticmethod
+    def render(shap_values, output=-1, row=0):
+        '''Return the explained image as a RGBA uint8 array.
+
+        The image matches the image shap.plots.image draws for the
+        output: positive values are red, negative values are blue, and
+        values near zero are transparent. By default the last output is
+        rendered, which is the final column of the shap plot.
+
+        Parameters:
+        shap_values: A shap Explanation object, an array of shape 
+                     (rows, H, W, C, outputs), or a list containing an 
+                     array of shape (rows, H, W, C) or (rows, H, W) for
+                     each model output.
+        output: The index of the model output to render. Default is -1.
+        row: The index of the image to render. Default is 0.
+        '''
+        shap_values = ShapImageRenderer.get_output_values(shap_values)
+        summed_values = [
+                values if values.ndim == 3 else values.sum(-1)
+                for values in shap_values
+            ]
+
+        # the colour scale is shared by every output, as in shap
+        abs_values = np.abs(np.stack(summed_values, 0)).flatten()
+        max_value = np.nanpercentile(abs_values, MAX_VALUE_PERCENTILE)
+
+        return ShapImageRenderer.apply_colour_table(
+                    summed_values[output][row], -max_value, max_value
+                )
+
+    @staticmethod
+    def get_output_values(shap_values):
+        '''Return a list containing an array of SHAP values for each
+        model output.
+
+        Parameters:
+        shap_values: A shap Explanation object, an array, or a list of
+                     arrays of SHAP values.
+        '''
+        if hasattr(shap_values, 'output_dims'):
+            values = shap_values.values
+            if len(shap_values.output_dims) == 1:
+                return [values[..., i] for i in range(values.shape[-1])]
+            shap_values = values
+
+        if not isinstance(shap_values, list):
+            shap_values = np.asarray(shap_values)
+            if shap_values.ndim == 5:
+                # the outputs of newer shap explainers are the last axis
+                # of one array, as in (rows, H, W, C, outputs)
+                shap_values = [shap_values[..., i] 
+                               for i in range(shap_values.shape[-1])]
+            else:
+                shap_values = [shap_values]
+
+        shap_values = [np.asarray(values) for values in shap_values]
+        if shap_values[0].ndim == 3 and shap_values[0].shape[-1] in (1, 3):
+            # a single image with channels
+            shap_values = [values[None] for values in shap_values]
+
+        return shap_values
+
+    @staticmethod
+    def apply_colour_table(values, vmin, vmax):
+        '''Return a RGBA uint8 array of the values mapped through the
+        red_transparent_blue colour table.
+
+        Parameters:
+        values: A 2D array of SHAP values.
+        vmin: The value mapped to the first colour in the table.
+        vmax: The value mapped to the last colour in the table.
+        '''
+        colour_table = ShapImageRenderer.__get_colour_table()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scaled = (values - vmin) / (vmax - vmin)
+
+        invalid = ~np.isfinite(scaled)
+        scaled[invalid] = 0
+        index = np.clip(
+                    scaled * COLOUR_TABLE_SIZE, 0, COLOUR_TABLE_SIZE - 1
+                ).astype(int)
+
+        image = colour_table[index]
+        image[invalid] = 0      # invalid values are fully transparent
+        return image
+
+    @staticmethod
+    def __get_colour_table():
+        '''Return the red_transparent_blue colour table as an array of
+        RGBA uint8 colours.'''
+        if ShapImageRenderer.__colour_table is None:
+            fade_out = np.linspace(1, 0, COLOURS_PER_SIDE)
+            fade_in = np.linspace(0, 1, COLOURS_PER_SIDE)
+            colours = np.concatenate([
+                        np.column_stack([
+                            np.tile(BLUE_RGB, (COLOURS_PER_SIDE, 1)), fade_out
+                        ]),
+                        np.column_stack([
+                            np.tile(RED_RGB, (COLOURS_PER_SIDE, 1)), fade_in
+                        ]),
+                    ])
+
+            positions = np.linspace(0, 1, len(colours))
+            table_positions = np.linspace(0, 1, COLOUR_TABLE_SIZE)
+            table = np.column_stack([
+                        np.interp(table_positions, positions, colours[:, i])
+                        for i in range(4)
+                    ])
+            ShapImageRenderer.__colour_table = (table * 255).astype(np.uint8)
+
+        return ShapImageRenderer.__colour_table
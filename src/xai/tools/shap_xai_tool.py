@@ -11,21 +11,70 @@ from warnings import filterwarnings
 filterwarnings("ignore", message=".*The 'nopython' keyword.*")
 
 from xai.tools.xai_tool import XaiTool
+from xai.tools.shap_image_renderer import ShapImageRenderer
+from xai.tools.shap_explainer_pool import ShapExplainerPool
 import shap
 import matplotlib.pyplot as plt
+import numpy as np
 from analyser.image_analyser import ImageAnalyser
+from analyser.pixel_analyser import PixelAnalyser as pixel
+
+MAX_EVALS = 5000
+BATCH_SIZE = 50
+BACKGROUND_SIZE = 50
+GRADIENT_SAMPLES = 200
+SHAP_MODES = ['partition', 'gradient']
+ADAPTIVE_START_EVALS = 500
+ADAPTIVE_TOLERANCE = 0.01
 
 class ShapXaiTool(XaiTool):
-    def __init__(self, target_im, model, images):
+    def __init__(self, target_im, model, model_input, images, 
+            max_evals=MAX_EVALS,
+            batch_size=BATCH_SIZE, mode=SHAP_MODES[0], adaptive=False,
+            tolerance=ADAPTIVE_TOLERANCE):
         '''Construct the ShapXaiTool object.
             
         Parameters:
         target_im: The target image being classified.
         model: The classifcation model used to classify the target image.
-        images: A numpy matrix of all the images in the dataset. 
+        model_input: The target image formatted according to the 
+                     model's input data format.
+        images: The DatasetStore or LazyDataset of the dataset images. 
+                The first images are the background of the gradient 
+                explainer.
+        max_evals: The maximum number of masked images evaluated by the
+                   model. Default is MAX_EVALS.
+        batch_size: The number of masked images evaluated per model 
+                    call. Default is BATCH_SIZE.
+        mode: The SHAP explainer used. 'partition' masks regions of the
+              image and evaluates the model up to max_evals times. 
+              'gradient' uses expected gradients over a background of 
+              dataset images. Default is 'partition'.
+        adaptive: If True, the partition explainer starts with a budget
+                  of ADAPTIVE_START_EVALS evaluations and doubles it 
+                  until the explained image stops changing, using at 
+                  most max_evals evaluations in total. Default is False.
+        tolerance: The largest fraction of pixels whose positive or 
+                   negative classification may change between budgets
+                   for the explained image to have converged. Default
+                   is ADAPTIVE_TOLERANCE.
+
+        Raises:
+        ValueError: When the mode is not in SHAP_MODES.
         '''
+        if mode not in SHAP_MODES:
+            raise ValueError(f'SHAP mode must be one of {SHAP_MODES}.')
+
         self.target_image = target_im
+        self.model_input = model_input
         self.images = images
+        self.max_evals = max_evals
+        self.batch_size = batch_size
+        self.mode = mode
+        self.adaptive = adaptive
+        self.tolerance = tolerance
+        self.evaluations_used = 0
+        self.converged = False
         
         self.expl_object = self.get_explaination(model)
         self.set_explained_image(image=None, expl_object=self.expl_object)
@@ -37,12 +86,26 @@ class ShapXaiTool(XaiTool):
         target_im: The target image being classified. 
         model: The classifcation model used to classify the target image. 
         '''
-        x, y, depth = self.target_image.shape
-        masker = shap.maskers.Image(f'blur({x},{y})', self.target_image.shape)
-        return shap.Explainer(model, masker)
+        if self.mode == 'gradient':
+            return ShapExplainerPool.get_gradient_explainer(
+                        model, self.images, BACKGROUND_SIZE, self.batch_size
+                    )
+
+        return ShapExplainerPool.get_explainer(
+                    model, self.target_image.shape
+                )
 
     def show(self):
         '''Display the XAI tool's explaination.'''
+        if self.mode == 'gradient':
+            shap.plots.image(
+                        self.shap_values, 
+                        pixel_values=self.model_input, 
+                        show=False
+                    )
+        else:
+            shap.plots.image(self.shap_values, show=False)
+
         analyser = ImageAnalyser(self)
         print(analyser.results())
 
@@ -56,25 +119,108 @@ class ShapXaiTool(XaiTool):
         expl_object: The explaination object generated by the XAI tool.
                      Default is None.
         '''
+        if self.mode == 'gradient':
+            self.__set_gradient_explained_image(expl_object)
+            return
+
+        if self.adaptive:
+            self.__set_adaptive_explained_image(expl_object)
+            return
+
+        self.shap_values = self.__explain(expl_object, self.max_evals)
+        self.evaluations_used = self.max_evals
+
+        # render the explained image without drawing the shap plot
+        self.explained_image = ShapImageRenderer.render(self.shap_values)
+
+    def __set_adaptive_explained_image(self, expl_object):
+        '''Set the image explained by the partition explainer, doubling
+        the evaluation budget until the positive and negative regions of
+        the explained image stop changing.
+
+        The partition explainer cannot resume an explanation, so each
+        budget explains the image again. Once doubling the budget would 
+        leave too few evaluations for a larger budget after it, the last
+        budget is every evaluation left. An image that never converges
+        therefore uses exactly max_evals evaluations, as a fixed budget
+        does, and its last explanation is the largest.
+
+        Parameters:
+        expl_object: The SHAP partition explainer.
+        '''
+        max_evals = min(ADAPTIVE_START_EVALS, self.max_evals)
+        previous_masks = None
+
+        while True:
+            shap_values = self.__explain(expl_object, max_evals)
+            self.evaluations_used += max_evals
+            explained_image = ShapImageRenderer.render(shap_values)
+            masks = pixel.get_positive_negative_masks(explained_image, 'shap')
+
+            if previous_masks is not None:
+                changed = (masks[0] != previous_masks[0]) \
+                        | (masks[1] != previous_masks[1])
+                self.converged = changed.mean() <= self.tolerance
+
+            remaining = self.max_evals - self.evaluations_used
+            if self.converged or remaining <= 0:
+                break
+
+            previous_masks = masks
+            max_evals *= 2
+            if remaining - max_evals < max_evals * 2:
+                max_evals = remaining
+
+        self.shap_values = shap_values
+        self.explained_image = explained_image
+
+    def __explain(self, expl_object, max_evals):
+        '''Return the SHAP values of the explained image.
+
+        Parameters:
+        expl_object: The SHAP partition explainer.
+        max_evals: The maximum number of masked images evaluated by the
+                   model.
+        '''
+        # only the highest scoring output is analysed
         shap_values = expl_object(
-                    self.images[-1],
-                    max_evals=5000,
-                    batch_size=50, 
-                    outputs=shap.Explanation.argsort.flip[:2]
+                    self.model_input,
+                    max_evals=max_evals,
+                    batch_size=self.batch_size, 
+                    outputs=shap.Explanation.argsort.flip[:1]
                 )
         shap_values.output_names.append("Brain MRI")
-        shap.plots.image(shap_values, show=False)
-        
-        # extract the explained image from the plot
-        fig = plt.gcf()
-        axes = plt.gca()
-        renderer = fig.canvas.get_renderer()
-
-        images = axes.get_images()[1]       # get explained image axes
-        self.explained_image = images.make_image(
-                    renderer, 
-                    unsampled=True      # retain image dimensions
-                )[0]
+        return shap_values
+
+    def __set_gradient_explained_image(self, expl_object):
+        '''Set the image explained by the gradient explainer.
+
+        Parameters:
+        expl_object: The SHAP gradient explainer.
+        '''
+        # only the highest scoring output is analysed
+        shap_values = expl_object.shap_values(
+                    self.model_input.astype(np.float32),
+                    nsamples=GRADIENT_SAMPLES,
+                    ranked_outputs=1,
+                )
+        if isinstance(shap_values, tuple):
+            shap_values = shap_values[0]    # drop the output ranks
+
+        self.shap_values = shap_values
+        self.evaluations_used = GRADIENT_SAMPLES
+        self.explained_image = ShapImageRenderer.render(shap_values)
+
+    def get_evaluations_used(self):
+        '''Return the number of model evaluations used to explain the
+        image. For the gradient explainer this is the number of 
+        background samples differentiated.'''
+        return self.evaluations_used
+
+    def has_converged(self):
+        '''Return True if the adaptive budget stopped because the 
+        explained image had converged.'''
+        return self.converged
 
     def get_target_image(self):
         '''Return the target image being explained by the XAI tool.'''
@@ -9,20 +9,23 @@ __version__ = '05-07-2023'
 
 from abc import ABC, abstractmethod
 import misc.wrapper as wrapper
-import cv2
 from analyser.detector.tumor_detector import TumorDetector
 
 class XaiFactory:
 
-    def __init__(self, impath, model):
+    def __init__(self, impath, model, images=None):
         '''Construct the XaiFactory abstract class.
 
         Parameters:
         impath: The directory path to the target image. 
         model: The classifcation model used to classify the target image.
+        images: The DatasetStore or LazyDataset holding the target 
+                image. Default is None, which loads the image through
+                the image cache.
         '''
         self.impath = impath
         self.model = model
+        self.images = images
         self.target_im = self.__get_image_from_path(self.impath)
         self.td = TumorDetector(self.__get_image_from_path(self.impath))
         self.highlight_im = self.td.highlight_tumor_on_image()
@@ -35,18 +38,19 @@ class XaiFactory:
         Parameters:
         path: The directory path where the target image is stored. 
         '''
-        image = cv2.imread(path)
-        x, y, depth = image.shape
+        if self.images is not None:
+            # the image is copied, as the tumor is drawn on it
+            return self.images.get_image(self.images.get_index(path)).copy()
+        return wrapper.get_image(path)
 
-        image = wrapper.crop(
-                    image
-                )
-        image = cv2.resize(
-                    image, 
-                    dsize=(x, y), 
-                    interpolation=cv2.INTER_CUBIC
-                )   
-        return image
+    def get_model_input(self):
+        '''Return the target image formatted according to the model's 
+        input data format.'''
+        if self.images is not None:
+            return self.images.get_model_input(
+                        self.images.get_index(self.impath)
+                    )
+        return wrapper.prepare_image(self.impath)
     
     def get_image_path(self):
         '''Return the directory path of the target image.'''